@@ -2,101 +2,178 @@
 This is the main file for the dash app
 """
 
+import logging
 import os
+import tempfile
 from dotenv import load_dotenv
 
-import pandas as pd
 import dash
-from dash import dcc, html, Input, Output
+from dash import DiskcacheManager, dcc, html, Input, Output
 import dash_bootstrap_components as dbc
+import diskcache
 
-from callbacks import cb_bar_chart, cb_continent, cb_country_filter, cb_map, cb_sub_region, cb_status_type
+from callbacks import cb_continent, cb_country_filter, cb_export, cb_map, cb_sub_region, cb_views
 from components import filters
 from components.visualisations import main_map, bar_chart
+from utils.dataset import DATA_DIR, load_dataset
+from utils.dataset_handle import DatasetHandle
+from utils.export import register_export
+from utils.figure_cache import FigureCache, warm_up
+from utils.metrics import register_metrics
+from utils.payload import register_payload_hooks
 
+load_dotenv()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
 
-####################
-# data
-####################
-df = pd.read_parquet("../data/clean/gwpt.parquet")
-agg = pd.read_parquet("../data/clean/gwpt_agg.parquet")
-geo = pd.read_parquet("../data/clean/geo.parquet")
-
-
-####################
-# app & components
-####################
-app = dash.Dash(
-    __name__,
-    title="GWPT analysis",
-    external_stylesheets=[dbc.themes.SLATE, dbc.icons.FONT_AWESOME, 'assets/css/styles.css'],
-)
-
-continents = filters.generate_continents(geo)
-continents_dbc = filters.generate_continent_cards(continents)
-sub_region_filter = filters.generate_sub_region_filter()
-country_filter = filters.generate_country_filter()
-status_filter = filters.generate_status_filter(df)
-type_filter = filters.generate_type_filter(df)
-time_slider = filters.generate_time_slider(df)
-
-
-####################
-# layout
-####################
-app.layout = dbc.Container([
-    dcc.Store(id='last_clicked_continent', data='Total'),  # Add this line here
-    dbc.Row([html.H1("Global wind power tracker analysis",
-                     className='text-center mb-4',
-                     style={'height': '45px'})]),
-    dbc.Row([
-        dbc.Col(  # sidebar column
-            [dbc.Row(x, style={'height': '15vh'}) for x in continents_dbc],
-            style={'height': '90vh'},
-            width=2),
-        dbc.Col([
-            dbc.Row([  # filters row
-                dbc.Col(sub_region_filter, width=2),
-                dbc.Col(country_filter, width=2),
-                dbc.Col(status_filter, width=2),
-                dbc.Col(type_filter, width=2),
-                dbc.Col(time_slider, width=4)
-            ],
-                style={'height': '5vh'}),
+
+def create_app(dataset=None):
+    """
+    App factory: build the dash app, its layout and callbacks on top of a (shared) dataset
+    Args:
+        dataset: a utils.dataset.Dataset, used as is. When not provided it is loaded from data/clean and reloaded when
+            the files change (every DATA_RELOAD_SECONDS, 0 disables the reload)
+    Returns:
+        the dash app, its flask server (app.server) is the WSGI application
+    """
+    if dataset is None:
+        dataset_handle = DatasetHandle(load_dataset(DATA_DIR), DATA_DIR)
+    else:
+        dataset_handle = DatasetHandle(dataset)
+    reload_seconds = float(os.getenv("DATA_RELOAD_SECONDS", 0))
+
+    # progressive map rendering: the detailed layer of large views is drawn by a background job in a local process
+    progressive_rows = int(os.getenv("PROGRESSIVE_MAP_ROWS", 0))
+    background_callback_manager = None
+    if progressive_rows:
+        cache_dir = os.getenv("BACKGROUND_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "gwpt_background")
+        # the results are kept per detail request and data version, a repeated request is answered from the cache
+        background_callback_manager = DiskcacheManager(
+            diskcache.Cache(cache_dir),
+            cache_by=[lambda: dataset_handle.version],
+            expire=int(os.getenv("BACKGROUND_CACHE_SECONDS", 3600)),
+        )
+
+    # persistent cache of the rendered figures, filled for the default views at startup
+    figure_cache = None
+    if os.getenv("FIGURE_CACHE_DIR"):
+        figure_cache = FigureCache(os.getenv("FIGURE_CACHE_DIR"),
+                                   max_bytes=int(os.getenv("FIGURE_CACHE_MB", 512)) * 1024 ** 2)
+
+    ####################
+    # app & components
+    ####################
+    app = dash.Dash(
+        __name__,
+        title="GWPT analysis",
+        external_stylesheets=[dbc.themes.SLATE, dbc.icons.FONT_AWESOME, 'assets/css/styles.css'],
+        background_callback_manager=background_callback_manager,
+    )
+
+    # the continent cards and their callbacks are registered once, for the regions of the initial dataset
+    continents = filters.generate_continents(dataset_handle.get().geo)
+    continents_dbc = filters.generate_continent_cards(continents)
+    export_links = filters.generate_export_links()
+    warned_versions = set()
+
+    ####################
+    # layout
+    ####################
+    def serve_layout():
+        """
+        Build the layout from the current dataset on every page load, so a page load after a reload shows the filter
+        values and year range of the new release
+        """
+        dataset = dataset_handle.get()
+        regions_changed = set(filters.generate_continents(dataset.geo)) != set(continents)
+        if regions_changed and dataset.version not in warned_versions:
+            warned_versions.add(dataset.version)
+            logger.warning("the regions of data version %s differ from the continent cards, restart to update them",
+                           dataset.version[:12])
+        sub_region_filter = filters.generate_sub_region_filter()
+        country_filter = filters.generate_country_filter()
+        status_filter = filters.generate_status_filter(dataset.df)
+        type_filter = filters.generate_type_filter(dataset.df)
+        time_slider = filters.generate_time_slider(dataset.df)
+        time_mode_filter = filters.generate_time_mode_filter()
+
+        return dbc.Container([
+            dcc.Store(id='last_clicked_continent', data='Total'),  # Add this line here
+            dcc.Store(id='map_render_state'),
+            dcc.Store(id='map_figure'),
+            dcc.Store(id='map_detail_request'),
+            dbc.Row([
+                dbc.Col(html.H1("Global wind power tracker analysis",
+                                className='text-center mb-4',
+                                style={'height': '45px'}),
+                        width={'size': 8, 'offset': 2}),
+                dbc.Col(export_links, width=2, className='text-end'),
+            ]),
             dbc.Row([
-                dbc.Col(  # map column
-                    dbc.Row(main_map, style={'height': '85vh'}),
-                    width=9),
-                dbc.Col(  # barchart column
-                    dbc.Row(bar_chart, style={'height': '85vh'}),
-                    style={'height': '85vh'},
-                    width=3),
-            ],
-                style={'height': '85vh'}),
-        ], width=10)
-    ]),
-], fluid=True
-)
-
-
-####################
-# callbacks
-####################
-cb_continent.register_update_capacities(app, continents, df)
-cb_continent.register_update_ban_style(app, continents)
-cb_continent.register_update_clicked_continent(app, continents)
-cb_sub_region.register_update_subregion_filter(app, continents, agg)
-cb_sub_region.register_reset_subregion(app, continents)
-cb_country_filter.register_update_country_filter(app, agg, continents)
-cb_country_filter.register_reset_country(app, continents)
-cb_map.register_update_map(app, df)
-cb_bar_chart.register_update_bar_chart(app, df)
-cb_status_type.register_update_type_filter(app, df)
-cb_status_type.register_update_status_filter(app, df)
+                dbc.Col(  # sidebar column
+                    [dbc.Row(x, style={'height': '15vh'}) for x in continents_dbc],
+                    style={'height': '90vh'},
+                    width=2),
+                dbc.Col([
+                    dbc.Row([  # filters row
+                        dbc.Col(sub_region_filter, width=2),
+                        dbc.Col(country_filter, width=2),
+                        dbc.Col(status_filter, width=2),
+                        dbc.Col(type_filter, width=2),
+                        dbc.Col([time_slider, time_mode_filter], width=4)
+                    ],
+                        style={'height': '5vh'}),
+                    dbc.Row([
+                        dbc.Col(  # map column
+                            dbc.Row(main_map, style={'height': '85vh'}),
+                            width=9),
+                        dbc.Col(  # barchart column
+                            dbc.Row(bar_chart, style={'height': '85vh'}),
+                            style={'height': '85vh'},
+                            width=3),
+                    ],
+                        style={'height': '85vh'}),
+                ], width=10)
+            ]),
+        ], fluid=True
+        )
+
+    app.layout = serve_layout
+
+    ####################
+    # callbacks
+    ####################
+    cb_continent.register_update_ban_style(app, continents)
+    cb_continent.register_update_clicked_continent(app, continents)
+    cb_sub_region.register_update_subregion_filter(app, continents, dataset_handle)
+    cb_sub_region.register_reset_subregion(app, continents)
+    cb_country_filter.register_update_country_filter(app, dataset_handle, continents)
+    cb_country_filter.register_reset_country(app, continents)
+    # one request per interaction for the map, bar chart, continent cards and status / type options
+    cb_views.register_update_views(app, continents, dataset_handle, progressive_rows, figure_cache)
+    cb_map.register_update_map_detail(app, dataset_handle, progressive_rows)
+    cb_export.register_update_export_links(app)
+
+    register_export(app.server, dataset_handle)
+    register_payload_hooks(app.server)
+    register_metrics(app, dataset_handle, figure_cache)
+
+    if reload_seconds and dataset_handle.data_dir is not None:
+        # started on the first request, so every pre-forked worker runs its own watcher
+        @app.server.before_request
+        def watch_dataset():
+            dataset_handle.watch(reload_seconds)
+
+    if figure_cache is not None:
+        warm_up(app, continents)
+
+    return app
+
 
 if __name__ == "__main__":
-    load_dotenv()
     SERVER_PORT = os.getenv("SERVER_PORT")
 
-    # run the server - debug=True auto reloads browser when the dev makes changes
+    # run the development server - debug=True auto reloads browser when the dev makes changes
+    # for production, use the WSGI entry point in wsgi.py
+    app = create_app()
     app.run_server(host="0.0.0.0", port=SERVER_PORT, debug=False)
@@ -0,0 +1,82 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    infovis: {
+        update_clicked_continent: function() {
+            // name of the last clicked continent BAN, "Total" on the initial call
+            const triggered = dash_clientside.callback_context.triggered;
+            if (!triggered || triggered.length === 0 || triggered[0].prop_id === ".") {
+                return "Total";
+            }
+            return triggered[0].prop_id.split(".")[0].replace("_click", "");
+        },
+        update_ban_style: function(last_clicked_continent) {
+            // the continent buttons are passed as state, highlight the one that was clicked last
+            const buttons = dash_clientside.callback_context.states_list;
+            return buttons.map(button => button.id === `${last_clicked_continent}_click` ? "info" : "secondary");
+        },
+        reset_value: function() {
+            return null;
+        },
+        keep_available_values: function() {
+            // the continent buttons, then the new options are the inputs, the selected values the last argument
+            const args = Array.from(arguments);
+            const value = args[args.length - 1];
+            const options = args[args.length - 2] || [];
+            if (value === null || value === undefined || value.length === 0) {
+                return dash_clientside.no_update;
+            }
+            // a continent click clears the selection
+            const triggered = dash_clientside.callback_context.triggered || [];
+            if (triggered.some(trigger => trigger.prop_id.endsWith("_click.n_clicks"))) {
+                return null;
+            }
+            // otherwise keep the selected values that are still available
+            const available = new Set(options.map(option => option.value !== undefined ? option.value : option));
+            const kept = [].concat(value).filter(item => available.has(item));
+            if (kept.length === [].concat(value).length) {
+                return dash_clientside.no_update;
+            }
+            return kept.length ? kept : null;
+        },
+        update_export_links: function(continent, sub_region, country, status, itype, time_range, time_mode) {
+            // the download links of the export endpoint (utils/export.py) carry the current filters
+            const filters = {continent, sub_region, country, status, itype, time_mode};
+            if (time_range) {
+                filters.start_year = time_range[0];
+                filters.end_year = time_range[1];
+            }
+            const query = new URLSearchParams();
+            Object.entries(filters).forEach(([key, value]) => {
+                // the values of a multi-select are repeated arguments
+                [].concat(value).forEach(item => {
+                    if (item !== null && item !== undefined && item !== "") {
+                        query.append(key, item);
+                    }
+                });
+            });
+            return ["csv", "parquet"].map(format => `/export/gwpt.${format}?${query.toString()}`);
+        },
+        decode_figure: function(figure) {
+            // turn the base64 typed arrays of the traces (see utils/figure_encoding.py) into javascript typed arrays
+            if (!figure) {
+                return dash_clientside.no_update;
+            }
+            const typedArrays = {
+                f8: Float64Array, f4: Float32Array, i4: Int32Array, i2: Int16Array, i1: Int8Array, u1: Uint8Array
+            };
+            const decode = function(value) {
+                if (Array.isArray(value)) {
+                    return value.map(decode);
+                }
+                if (value === null || typeof value !== "object") {
+                    return value;
+                }
+                if (typeof value.bdata === "string" && typedArrays[value.dtype]) {
+                    const bytes = Uint8Array.from(atob(value.bdata), c => c.charCodeAt(0));
+                    return new typedArrays[value.dtype](bytes.buffer);
+                }
+                return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, decode(item)]));
+            };
+            return Object.assign({}, figure, {data: decode(figure.data || [])});
+        }
+    }
+});
@@ -1,82 +1,38 @@
-from dash import callback_context
-from dash.dependencies import Input, Output
-import plotly.express as px
+from utils.figures import BarFigureBuilder
+from utils.metrics import phase
 
-from utils.utils import filter_data
 
-def register_update_bar_chart(app, df):
-    @app.callback(
-        Output('bar_chart', 'figure'),
-        [Input('last_clicked_continent', 'data'),
-         Input('sub_region_filter', 'value'),
-         Input('country_filter', 'value'),
-         Input('status_filter', 'value'),
-         Input('type_filter', 'value'),
-         Input('time_slider', 'value'),
-         ]
-    )
-    def update_bar_chart(continent, sub_region, country, status, itype, time_range):
+def bar_chart_view(figure_cache=None):
+    """
+    Create the bar chart view of the data views callback (see cb_views.py)
+    Args:
+        figure_cache: optional FigureCache (utils/figure_cache.py) holding the rendered figures
+    Returns:
+        the update_bar_chart function
+    """
+    bar_builder = BarFigureBuilder()
+
+    def update_bar_chart(query):
         """
         Updates the plotly bar chart when the user modifies the status filter, time slider or clicks on another continent
         Args:
-            status: list of selected status strings
-            time_range: tuple of 2 integers (start & end year)
-            continent: string value for last clicked continent
+            query: QueryState with the filters of the interaction, its dataset and the rows they select
         Returns:
             plotly figure to update the bar chart
         """
-        # filter the whole dataset
-        # print("filtering for bar chart")
-        dfx = filter_data(df, continent, sub_region, country, status, itype, time_range)
-        # aggregate onto project level: combine project phases and statuses
-        dfx_agg = dfx.groupby(["Region", "Subregion", "Country", "Installation Type", "Project Name", "Status"]).agg(
-            {"Capacity (MW)": "sum", "Latitude": "mean", "Longitude": "mean",
-             "Start year": "mean"}).reset_index()
-        # Sort DataFrame by capacity in descending order and select top 20 wind farms
-        top_20 = dfx_agg.nlargest(20, "Capacity (MW)")
+        if figure_cache is not None:
+            return figure_cache.get_or_compute("bar_chart", dict(filters=query.filters, version=query.version),
+                                               lambda: _render(query))
+        return _render(query)
+
+    def _render(query):
+        """select the largest filtered projects and build the bar chart figure"""
+        with phase("filter"):
+            # aggregate onto project level (combine project phases) and select top 20 wind farms
+            top_20 = query.dataset.backend.top(query, 20)
         top_20 = top_20.sort_values("Capacity (MW)")
-        # Create horizontal bar chart
-        color_mapping = {
-            'operating': '#1b9e77',
-            'future': '#7570b3',
-            'retired': '#d95f02',
-        }
-        fig = px.bar(top_20,
-                     x='Capacity (MW)',
-                     y='Project Name',
-                     orientation='h',
-                     color='Status',
-                     color_discrete_map=color_mapping,
-                     hover_data=['Region', 'Subregion', 'Country',
-                                 'Project Name', 'Capacity (MW)'],
-                     title="Top 20 Largest Wind Farms <br> Capacity (MW)"
-                     )
-        fig.update_layout(
-            showlegend=False,
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.2,
-                xanchor="right",
-                x=1
-            ),
-            yaxis=dict(
-                categoryorder='total ascending'
-            ), 
-            autosize=False,
-            margin=dict(
-                l=220,
-                r=5,  # right margin
-                b=100,  # bottom margin
-                t=100,  # top margin
-                ),
-                title_x=0.5,  # title position
-        )
-        fig.update_yaxes(
-            title=None,
-            tickfont=dict(
-                size=10,
-            ),
-        )
-        fig.update_xaxes(title=None)
-        return fig
\ No newline at end of file
+        with phase("figure"):
+            fig = bar_builder.build(top_20)
+        return fig
+
+    return update_bar_chart
@@ -1,59 +1,42 @@
-import dash
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 
-from utils.utils import filter_data
+from callbacks.clientside import register_clientside
+from utils.metrics import phase
 
 
 def register_update_clicked_continent(app, continents):
-    @app.callback(
+    """
+    Update the data (dcc.store value) for the last clicked continent. Runs clientside, see assets/clientside.js.
+
+    The store gets the name of the last clicked continent if a button was clicked, otherwise "Total".
+    """
+    register_clientside(
+        app,
+        "update_clicked_continent",
         Output('last_clicked_continent', 'data'),
-        [Input(f"{continent}_click", 'n_clicks') for continent in continents]
+        [Input(f"{continent}_click", 'n_clicks') for continent in continents],
     )
-    def update_clicked_continent(*continent_clicks):
-        """
-        Update the data (dcc.store value) for the last clicked continent.
-
-        Parameters:
-        *continent_clicks: Variable number of input arguments representing the number of clicks for each continent.
-
-        Returns:
-        The name of the last clicked continent if a button was clicked, otherwise returns "Total".
-        """
-        ctx = dash.callback_context
-        if ctx.triggered:
-            button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-            clicked_continent = button_id.replace("_click", "")
-            return clicked_continent
-        else:
-            return "Total"
 
 
-def register_update_capacities(app, continents, df):
-    @app.callback(
-        [Output(f"{continent}_capacity", 'children') for continent in continents],
-        [Input('status_filter', 'value'),
-         Input('type_filter', 'value'),
-         Input('time_slider', 'value')]
-    )
-    def update_capacities_on_cards(status, itype, time_range):
+def capacities_view(continents):
+    """
+    Create the continent cards view of the data views callback (see cb_views.py)
+    Returns:
+        the update_capacities_on_cards function
+    """
+    def update_capacities_on_cards(query):
         """
         Updates the values on the BAN's when the status dropdown or time_range has been modified
         Args:
-            status: string
-            time_range: tuple of (start_year, end_year)
+            query: QueryState with the filters of the interaction, the continent filters are not used
         Returns:
             A list of strings, representing the capacities per continent
         """
-        dfx = filter_data(df, "Total", None, None, status, itype, time_range)
-
-        # make output values for every continent
-        output_capacities = []
-        for continent in continents:
-            if continent == "Total":
-                capa = dfx["Capacity (MW)"].sum()
-            else:
-                capa = dfx[dfx["Region"] == continent]["Capacity (MW)"].sum()
-            output_capacities = output_capacities + [capa]
+        # all continent values come from a single lookup in the precomputed cube
+        with phase("filter"):
+            capacity_cube = query.dataset.capacity_cube
+            capacities = capacity_cube.capacities(query.status, query.itype, query.time_range, query.time_mode)
+        output_capacities = [capacities.get(continent, 0) for continent in continents]
 
         # format output
         output_capacities = [round(x) for x in output_capacities]  # round
@@ -62,26 +45,21 @@ def register_update_capacities(app, continents, df):
         output_capacities = [f"{x} MW" for x in output_capacities]  # adding the SI unit .
         return output_capacities
 
+    return update_capacities_on_cards
+
 
 def register_update_ban_style(app, continents):
-    @app.callback(
+    """
+    Changes the BAN color that you have clicked on to show it has been selected. Runs clientside, see
+    assets/clientside.js.
+
+    The buttons are passed as state so the browser knows their ids: the last clicked continent gets the "info" color,
+    all others "secondary".
+    """
+    register_clientside(
+        app,
+        "update_ban_style",
         [Output(f"{continent}_click", 'color') for continent in continents],
-        [Input('last_clicked_continent', 'data')]
+        [Input('last_clicked_continent', 'data')],
+        [State(f"{continent}_click", 'n_clicks') for continent in continents],
     )
-    def update_ban_style(last_clicked_continent):
-        """
-        Changes the BAN color that you have clicked on to show it has been selected
-
-        Parameters:
-        last_clicked_continent: string representing the currently active continent filter
-
-        Returns:
-        a list of color values for all the continent buttons 'color' prop
-        """
-        result = []
-        for continent in continents:
-            if continent == last_clicked_continent:
-                result.append("info")
-            else:
-                result.append("secondary")
-        return result
@@ -1,8 +1,10 @@
 import dash
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 
+from callbacks.clientside import register_clientside
 
-def register_update_country_filter(app, agg, continents):
+
+def register_update_country_filter(app, dataset_handle, continents):
     @app.callback(
         Output("country_filter", "options"),
         Input("sub_region_filter", "value"),
@@ -12,9 +14,9 @@ def register_update_country_filter(app, agg, continents):
         """
         Updates the available options in the country dropdown when the subregion filter has been selected
         Args:
-            sub_region: string specifying a subregion
+            sub_region: list of the selected subregions
         Returns:
-            list of (string) countries in this subregion
+            list of (string) countries in these subregions
         """
         # Get the ID of the triggering input
         ctx = dash.callback_context
@@ -24,20 +26,22 @@ def register_update_country_filter(app, agg, continents):
             if sub_region == "" or sub_region is None or sub_region == []:
                 return []
             else:
-                countries = agg[agg["Subregion"] == sub_region]["Country"].unique()
+                countries = dataset_handle.get().option_index.options("Country", sub_region=sub_region)
             return countries
         else:
             return []
 
 
 def register_reset_country(app, continents):
-    @app.callback(
+    """
+    Clears the currently selected 'country' values when a continent is clicked. When the subregions change, only the
+    selected countries that are no longer among the country options are removed, so adding a subregion keeps the
+    countries picked before. Runs clientside.
+    """
+    register_clientside(
+        app,
+        "keep_available_values",
         Output("country_filter", 'value'),
-        [Input(f"{continent}_click", 'n_clicks') for continent in continents],
-        Input("sub_region_filter", "value"),
+        [Input(f"{continent}_click", 'n_clicks') for continent in continents] + [Input("country_filter", "options")],
+        [State("country_filter", "value")],
     )
-    def reset_country(*button_clicks):
-        """
-        Clears the currently selected 'country' value when a continent is clicked, or another subregion is clicked
-        """
-        return None
@@ -0,0 +1,22 @@
+from dash.dependencies import Input, Output
+
+from callbacks.clientside import register_clientside
+
+
+def register_update_export_links(app):
+    """
+    Point the download links at the export endpoint (utils/export.py) with the current filters as query arguments.
+    Runs clientside, see assets/clientside.js.
+    """
+    register_clientside(
+        app,
+        "update_export_links",
+        [Output('export_csv', 'href'), Output('export_parquet', 'href')],
+        [Input('last_clicked_continent', 'data'),
+         Input('sub_region_filter', 'value'),
+         Input('country_filter', 'value'),
+         Input('status_filter', 'value'),
+         Input('type_filter', 'value'),
+         Input('time_slider', 'value'),
+         Input('time_mode', 'value')],
+    )
@@ -1,62 +1,49 @@
+from dash import Patch, no_update
 from dash.dependencies import Input, Output
-import plotly.express as px
-
-from utils.utils import filter_data
-
-
-def register_update_map(app, df):
-    @app.callback(
-        [Output('main_map', 'figure'),
-         Output('bar_chart', 'clickData'),
-         ],
-        [Input('last_clicked_continent', 'data'),
-         Input('sub_region_filter', 'value'),
-         Input('country_filter', 'value'),
-         Input('status_filter', 'value'),
-         Input('type_filter', 'value'),
-         Input('time_slider', 'value'),
-         Input('main_map', 'relayoutData'),
-         Input('bar_chart', 'clickData')]
-    )
-    def update_map(continent, sub_region, country, status, itype, time_range, zoom_info, clickdata):
+import numpy as np
+
+from callbacks.clientside import register_clientside
+from utils.figure_encoding import encode_figure, encode_traces
+from utils.figures import MapFigureBuilder
+from utils.metrics import phase
+from utils.query_state import QueryState
+from utils.spatial_index import viewport_bounds
+
+
+def map_view(progressive_rows=None, figure_cache=None):
+    """
+    Create the map view of the data views callback (see cb_views.py)
+    Args:
+        progressive_rows: when set, a detail view with more projects than this first shows the clusters of the
+            highest cluster level, the projects follow from update_map_detail
+        figure_cache: optional FigureCache (utils/figure_cache.py) holding the rendered figures of the views with the
+            default camera
+    Returns:
+        the update_map function
+    """
+    map_builder = MapFigureBuilder()
+
+    def update_map(query, zoom_info, clickdata, render_state, camera_only):
         """
         Update the map based on the selected status, time range, and clicked continent.
 
         Parameters:
-        continent (str): Continent that was last clicked.
-        sub_region (str): Sub-region within the continent.
-        country (str): Country within the sub-region.
-        status (list): List of selected statuses.
-        itype (list): List of selected types of installation.
-        time_range (tuple): Start and end year of the selected time range.
+        query (QueryState): the filters of the interaction, its dataset and the rows they select.
         zoom_info (dict): Information about the map's current zoom level.
         clickdata (dict): Data about the bar chart element that was clicked.
+        render_state (dict): Filters, cluster level and covered area of the markers currently on the map.
+        camera_only (bool): the map was only panned or zoomed.
 
         Returns:
-        dl.Map: Updated map with markers representing wind farms.
+        dl.Map: Updated map with markers representing wind farms, a full figure when the filters changed and a
+        partial update (Patch) on a pan or zoom. The render state is returned alongside, and in progressive mode the
+        request for the detailed layer (None when the figure is complete).
+        The figure goes to the map_figure store with its numeric arrays binary encoded, it is decoded in the browser.
         """
-        filtered_df = filter_data(df, continent, sub_region, country, status, itype, time_range)
-
-        agg_country = filtered_df.groupby(["Region", "Subregion", "Country", "Status", "Installation Type"]).agg(
-            {"Capacity (MW)": "sum", "Start year": "mean"}).reset_index()
-
-        # Find the index of the maximum capacity within each group
-        max_capacity_idx = filtered_df.groupby(["Region", "Subregion", "Country", "Status", "Installation Type"])[
-            'Capacity (MW)'].idxmax()
-
-        # Extract the corresponding latitude and longitude
-        max_capacity_coords = filtered_df.loc[
-            max_capacity_idx, ["Region", "Subregion", "Country", "Status", "Installation Type", "Latitude",
-                               "Longitude"]]
-
-        max_capacity_coords = max_capacity_coords.drop_duplicates(subset=[
-            "Region", "Subregion", "Country", "Status", "Installation Type"
-        ])
-
-        # Merge the results back into the aggregated dataframe
-        agg_country = agg_country.merge(max_capacity_coords,
-                                        on=["Region", "Subregion", "Country", "Status", "Installation Type"],
-                                        how='left')
+        if camera_only and not (zoom_info and 'mapbox.zoom' in zoom_info):
+            # a relayout without camera (a resize or autosize, plotly sends the center and zoom of every pan or zoom
+            # together): the zoom level below would fall back to the world view while the map stays where it is
+            return no_update, no_update, no_update, no_update
 
         if zoom_info and 'mapbox.zoom' in zoom_info:
             zoom_level = zoom_info['mapbox.zoom']
@@ -64,64 +51,150 @@ def register_update_map(app, df):
             zoom_level = 8
         else:
             zoom_level = 1
-
-        if zoom_level >= 3:
-            data = filtered_df  # Filter data based on zoom level
-            marker_min = 3
-            hover_name = 'Project Name'
-            opacity = 0.7
+        dataset = query.dataset
+        if zoom_level > dataset.cluster_pyramid.max_zoom:
+            level = "detail"
         else:
-            data = agg_country
-            marker_min = 4
-            hover_name = "Country"
-            opacity = 1
-
-        # Create a color mapping for the statuses (based on https://colorbrewer2.org/#type=diverging&scheme=BrBG&n=6)
-        color_mapping = {
-            'operating': '#1b9e77',
-            'future': '#7570b3',
-            'retired': '#d95f02',
-        }
-
-        fig = px.scatter_mapbox(data,
-                                lat="Latitude",
-                                lon="Longitude",
-                                size="Capacity (MW)",
-                                hover_name=hover_name,
-                                hover_data={"Region": True, "Subregion": True, "Country": True,
-                                            "Capacity (MW)": True, "Installation Type": True,
-                                            "Latitude": False, "Longitude": False},
-                                category_orders={
-                                    'Status': ['operating', 'future', 'retired']
-                                },
-                                color="Status",
-                                color_discrete_map=color_mapping,
-                                zoom=zoom_level,
-                                opacity=opacity
-                                )
-
-        if zoom_info and 'mapbox.center' in zoom_info:
-            fig.update_layout(
-                mapbox=dict(
-                    center=dict(lat=zoom_info['mapbox.center']['lat'], lon=zoom_info['mapbox.center']['lon']),
-                    zoom=zoom_level
-                ))
-
-        fig.update_layout(mapbox_style="carto-positron")
-        fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-        fig.update_traces(marker_sizemin=marker_min)
-        fig.update_layout(legend=dict(
-            yanchor="top",
-            y=0.955,
-            xanchor="right",
-            x=1
-        ))
-
-        # Center and zoom to clicked project on bar chart
+            level = min(max(int(zoom_level), 0), dataset.cluster_pyramid.max_zoom)
+        # as json, like the render state the browser sends back
+        filters = [list(value) if isinstance(value, tuple) else value for value in query.filters]
+
+        # a pan or zoom without filter change: only patch the camera when the sent markers still cover the view
+        same_filters = (camera_only and clickdata is None and render_state is not None
+                        and render_state['filters'] == filters)
+        if same_filters and render_state['level'] == level:
+            center = zoom_info.get('mapbox.center') if zoom_info else None
+            visible = viewport_bounds(zoom_info, center, zoom_level, margin=0)
+            if _covers(render_state['bounds'], visible):
+                return _camera_patch(zoom_info), no_update, no_update, no_update
+
+        # Center to clicked project on bar chart, otherwise keep the current center
+        clicked_project = None
         if clickdata is not None:
-            clicked_project = filtered_df[filtered_df['Project Name'] == clickdata['points'][0]['label']]
-            clicked_project = clicked_project.iloc[0]
-            fig.update_layout(mapbox_center_lat=float(clicked_project['Latitude']),
-                              mapbox_center_lon=float(clicked_project['Longitude']))
+            rows = dataset.project_table.rows_for(clickdata['points'][0]['label'])
+            rows = rows[query.mask[rows]]
+            clicked_project = dataset.df.iloc[rows[0]] if len(rows) else None
+        if clicked_project is not None:
+            center = dict(lat=float(clicked_project['Latitude']), lon=float(clicked_project['Longitude']))
+        elif zoom_info and 'mapbox.center' in zoom_info:
+            center = zoom_info['mapbox.center']
+        else:
+            center = None
+
+        # only send the projects inside (and around) the visible area, the derived corners are stale after a click
+        bounds = viewport_bounds(None if clicked_project is not None else zoom_info, center, zoom_level)
+        view = dict(filters=filters, level=level, zoom=zoom_level, center=center, bounds=bounds)
+        if figure_cache is not None and center is None:
+            # only the views with the default camera (page load, continent click) repeat across sessions, the float
+            # camera of a pan or zoom would write a figure per request that is never read again
+            rendered = figure_cache.get_or_compute("map", dict(view, progressive_rows=progressive_rows,
+                                                               version=query.version),
+                                                   lambda: _render(dataset, query.mask, **view))
+        else:
+            rendered = _render(dataset, query.mask, **view)
 
-        return fig, None
+        render_state = dict(filters=filters, level=level, bounds=bounds)
+        if same_filters:
+            # the camera already moved in the browser, only the markers are replaced
+            patched_fig = _camera_patch(zoom_info)
+            patched_fig['data'] = rendered['figure']['data']
+            return patched_fig, no_update, render_state, rendered['detail_request']
+        return rendered['figure'], None, render_state, rendered['detail_request']
+
+    def _render(dataset, mask, filters, level, zoom, center, bounds):
+        """
+        Select the filtered projects in view and build the encoded map figure
+        Returns:
+            dict with the figure and the detail request of a progressive update (or None)
+        """
+        detail_request = None
+        clustered = level != "detail"
+        with phase("filter"):
+            mask = _in_view(dataset.spatial_index, mask, bounds)
+
+            if level == "detail" and progressive_rows and np.count_nonzero(mask) > progressive_rows:
+                # cheap aggregated layer first, the projects are drawn by update_map_detail
+                detail_request = dict(filters=filters, zoom=zoom, bounds=bounds)
+                clustered = True
+                data = dataset.cluster_pyramid.clusters(mask, dataset.cluster_pyramid.max_zoom)
+            elif level == "detail":
+                data = dataset.df[mask]
+            else:
+                # capacity weighted clusters of the filtered projects for this zoom level
+                data = dataset.cluster_pyramid.clusters(mask, zoom)
+
+        with phase("figure"):
+            fig = map_builder.build(data, zoom, center=center, clustered=clustered)
+        return dict(figure=encode_figure(fig), detail_request=detail_request)
+
+    return update_map
+
+
+def register_update_map_detail(app, dataset_handle, progressive_rows=None):
+    """
+    Register the browser side decoding of the map figure and, in progressive mode, the background callback drawing
+    the detailed layer (requires a background callback manager on the app)
+    Args:
+        dataset_handle: the DatasetHandle, the job uses the dataset current in the process that started it
+    """
+    # the binary encoded figure is decoded into typed arrays in the browser, see utils/figure_encoding.py
+    register_clientside(app, "decode_figure", Output('main_map', 'figure'), [Input('map_figure', 'data')])
+    if not progressive_rows:
+        return
+    map_builder = MapFigureBuilder()
+
+    @app.callback(
+        Output('map_figure', 'data', allow_duplicate=True),
+        Input('map_detail_request', 'data'),
+        background=True,
+        prevent_initial_call=True,
+    )
+    def update_map_detail(detail_request):
+        """
+        Draw the projects of a progressive map update, runs as a background job in a separate process.
+        Every new request of update_map (also None) makes the renderer terminate the job that is still running, so a
+        stale detailed layer never replaces a newer map.
+
+        Parameters:
+        detail_request (dict): the normalized filters, zoom level and bounds of the coarse layer on the map.
+
+        Returns:
+        Patch: replaces the markers of the map, the camera is left as it is.
+        """
+        if detail_request is None:
+            return no_update
+        dataset = dataset_handle.get()
+        query = QueryState(dataset, *detail_request['filters'])
+        mask = _in_view(dataset.spatial_index, query.mask, detail_request['bounds'])
+        fig = map_builder.build(dataset.df[mask], detail_request['zoom'])
+        patched_fig = Patch()
+        patched_fig['data'] = encode_traces(fig['data'])
+        return patched_fig
+
+
+def _in_view(spatial_index, mask, bounds):
+    """the mask restricted to the projects inside the (lat_min, lat_max, lon_min, lon_max) bounds, as a new array"""
+    if bounds is None:
+        return mask.copy()
+    in_view = np.zeros_like(mask)
+    in_view[spatial_index.query(*bounds)] = True
+    return mask & in_view
+
+
+def _covers(outer, inner):
+    """check if the (lat_min, lat_max, lon_min, lon_max) box outer contains inner, None means the whole world"""
+    if outer is None:
+        return True
+    if inner is None or outer[2] > outer[3] or inner[2] > inner[3]:
+        return False
+    return outer[0] <= inner[0] and inner[1] <= outer[1] and outer[2] <= inner[2] and inner[3] <= outer[3]
+
+
+def _camera_patch(zoom_info):
+    """partial figure update that only syncs the mapbox center and zoom with the browser"""
+    patched_fig = Patch()
+    if zoom_info and 'mapbox.center' in zoom_info:
+        patched_fig['layout']['mapbox']['center'] = zoom_info['mapbox.center']
+    if zoom_info and 'mapbox.zoom' in zoom_info:
+        patched_fig['layout']['mapbox']['zoom'] = zoom_info['mapbox.zoom']
+    return patched_fig
@@ -1,43 +1,43 @@
-from dash.dependencies import Input, Output
+from utils.metrics import phase
 
-from utils.utils import filter_data
 
-
-def register_update_status_filter(app, df):
-    @app.callback(
-        Output("status_filter", 'options'),
-        [Input('last_clicked_continent', 'data'),
-        Input("sub_region_filter", "value"),
-        Input("country_filter", "value"),
-        Input("type_filter", "value"),
-        Input("time_slider", "value")]
-    )
-    def update_subregion_filter(continent, sub_region, country, itype, time_range):
+def status_options_view():
+    """
+    Create the status dropdown options view of the data views callback (see cb_views.py)
+    Returns:
+        the update_status_options function
+    """
+    def update_status_options(query):
         """
-        Updates the available options in the type dropdown when any filter option has been clicked
+        Updates the available options in the status dropdown when any other filter option has been clicked
+        Args:
+            query: QueryState with the filters of the interaction
         Returns:
-            a list of (string) type values
+            a list of (string) status values
         """
-        filtered_df = filter_data(df, continent, sub_region, country, None, itype, time_range)
-        options = filtered_df["Status"].unique()
+        with phase("filter"):
+            options = query.dataset.option_index.options("Status", *query.without("status"))
         return options
 
+    return update_status_options
 
-def register_update_type_filter(app, df):
-    @app.callback(
-        Output("type_filter", 'options'),
-        [Input('last_clicked_continent', 'data'),
-         Input("sub_region_filter", "value"),
-         Input("country_filter", "value"),
-         Input("status_filter", "value"),
-         Input("time_slider", "value")]
-    )
-    def update_subregion_filter(continent, sub_region, country, status, time_range):
+
+def type_options_view():
+    """
+    Create the type dropdown options view of the data views callback (see cb_views.py)
+    Returns:
+        the update_type_options function
+    """
+    def update_type_options(query):
         """
-        Updates the available options in the type dropdown when any filter option has been clicked
+        Updates the available options in the type dropdown when any other filter option has been clicked
+        Args:
+            query: QueryState with the filters of the interaction
         Returns:
             a list of (string) type values
         """
-        filtered_df = filter_data(df, continent, sub_region, country, status, None, time_range)
-        options = filtered_df["Installation Type"].unique()
+        with phase("filter"):
+            options = query.dataset.option_index.options("Installation Type", *query.without("itype"))
         return options
+
+    return update_type_options
@@ -1,8 +1,10 @@
 import dash
 from dash.dependencies import Input, Output
 
+from callbacks.clientside import register_clientside
 
-def register_update_subregion_filter(app, continents, agg):
+
+def register_update_subregion_filter(app, continents, dataset_handle):
     @app.callback(
         Output("sub_region_filter", 'options'),
         [Input(f"{continent}_click", 'n_clicks') for continent in continents]
@@ -22,19 +24,17 @@ def register_update_subregion_filter(app, continents, agg):
             continent = button_id.replace("_click", "")
             options = []
             if continent != "Total":
-                options = agg[agg["Region"] == continent]["Subregion"].unique()
+                options = dataset_handle.get().option_index.options("Subregion", continent)
         return options
 
 
-
 def register_reset_subregion(app, continents):
-    @app.callback(
+    """
+    Clears the currently selected 'sub region' value when a continent is clicked. Runs clientside.
+    """
+    register_clientside(
+        app,
+        "reset_value",
         Output("sub_region_filter", 'value'),
-        [Input(f"{continent}_click", 'n_clicks') for continent in continents]
+        [Input(f"{continent}_click", 'n_clicks') for continent in continents],
     )
-    def reset_subregion(*button_clicks):
-        """
-        Clears the currently selected 'sub region' value when a continent is clicked
-        """
-        return None
-
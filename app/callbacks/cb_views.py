@@ -0,0 +1,94 @@
+"""
+this module contains the data views callback: one request per interaction updates the map, the bar chart, the
+continent cards and the status and type options
+
+The filters are normalized and the rows they select are computed once per interaction in a QueryState, which is
+passed to every view together with the current version of the dataset. A view is only updated when one of its
+inputs changed, the others return no_update.
+"""
+
+from dash import ctx, no_update
+from dash.dependencies import Input, Output, State
+
+from callbacks.cb_bar_chart import bar_chart_view
+from callbacks.cb_continent import capacities_view
+from callbacks.cb_map import map_view
+from callbacks.cb_status_type import status_options_view, type_options_view
+from utils.query_state import QueryState
+
+FILTER_INPUTS = ["last_clicked_continent.data", "sub_region_filter.value", "country_filter.value",
+                 "status_filter.value", "type_filter.value", "time_slider.value", "time_mode.value"]
+MAP_INPUTS = ["main_map.relayoutData", "bar_chart.clickData"]
+
+# view -> the inputs it depends on
+VIEW_INPUTS = {
+    "map": FILTER_INPUTS + MAP_INPUTS,
+    "bar_chart": FILTER_INPUTS,
+    "capacities": ["status_filter.value", "type_filter.value", "time_slider.value", "time_mode.value"],
+    "status_options": [prop_id for prop_id in FILTER_INPUTS if prop_id != "status_filter.value"],
+    "type_options": [prop_id for prop_id in FILTER_INPUTS if prop_id != "type_filter.value"],
+}
+
+
+def _input(prop_id):
+    component_id, prop = prop_id.rsplit(".", 1)
+    return Input(component_id, prop)
+
+
+def register_update_views(app, continents, dataset_handle, progressive_rows=None, figure_cache=None):
+    """
+    Register the data views callback
+    Args:
+        app: the dash app
+        continents: the continent names of the cards
+        dataset_handle: the DatasetHandle holding the current dataset with the indexes behind the views
+        progressive_rows: see cb_map.map_view
+        figure_cache: optional FigureCache for the map and bar chart figures
+    """
+    update_map = map_view(progressive_rows, figure_cache)
+    update_bar_chart = bar_chart_view(figure_cache)
+    update_capacities_on_cards = capacities_view(continents)
+    update_status_options = status_options_view()
+    update_type_options = type_options_view()
+
+    @app.callback(
+        [Output('map_figure', 'data'),
+         Output('bar_chart', 'clickData'),
+         Output('map_render_state', 'data'),
+         Output('map_detail_request', 'data'),
+         Output('bar_chart', 'figure'),
+         Output('status_filter', 'options'),
+         Output('type_filter', 'options'),
+         ] + [Output(f"{continent}_capacity", 'children') for continent in continents],
+        [_input(prop_id) for prop_id in FILTER_INPUTS + MAP_INPUTS],
+        State('map_render_state', 'data'),
+    )
+    def update_views(continent, sub_region, country, status, itype, time_range, time_mode, zoom_info, clickdata,
+                     render_state):
+        """
+        Update the views that depend on the changed inputs
+        Args:
+            continent, sub_region, country, status, itype, time_range, time_mode: the filters, see FilterIndex.mask
+            zoom_info: relayoutData of the map
+            clickdata: clicked bar of the bar chart
+            render_state: the markers currently on the map, see cb_map.map_view
+        Returns:
+            the map outputs, the bar chart figure, the status and type options and the capacity of every continent
+        """
+        # the initial call has no trigger and updates all views
+        triggered = set(ctx.triggered_prop_ids)
+        changed = {view for view, inputs in VIEW_INPUTS.items() if not triggered or triggered & set(inputs)}
+        query = QueryState(dataset_handle.get(), continent, sub_region, country, status, itype, time_range, time_mode)
+
+        map_outputs = [no_update] * 4
+        if "map" in changed:
+            camera_only = triggered == {"main_map.relayoutData"}
+            map_outputs = list(update_map(query, zoom_info, clickdata, render_state, camera_only))
+        bar_chart = update_bar_chart(query) if "bar_chart" in changed else no_update
+        status_options = update_status_options(query) if "status_options" in changed else no_update
+        type_options = update_type_options(query) if "type_options" in changed else no_update
+        if "capacities" in changed:
+            capacities = update_capacities_on_cards(query)
+        else:
+            capacities = [no_update] * len(continents)
+        return map_outputs + [bar_chart, status_options, type_options] + capacities
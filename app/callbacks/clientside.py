@@ -0,0 +1,28 @@
+"""
+this module contains the pattern to register clientside callbacks
+
+Callbacks without a data dependency (mapping clicks to colours, ids or None) run in the browser, which saves an HTTP
+round trip and a server worker per call. Their javascript lives in assets/clientside.js under the NAMESPACE object.
+"""
+
+from dash import ClientsideFunction
+
+NAMESPACE = "infovis"
+
+
+def register_clientside(app, function_name, outputs, inputs, state=None):
+    """
+    Register a callback that is executed in the browser
+    Args:
+        app: the dash app
+        function_name: name of the javascript function in window.dash_clientside[NAMESPACE]
+        outputs: Output or list of Outputs
+        inputs: list of Inputs
+        state: optional list of States
+    """
+    app.clientside_callback(
+        ClientsideFunction(namespace=NAMESPACE, function_name=function_name),
+        outputs,
+        inputs,
+        state or [],
+    )
@@ -30,7 +30,8 @@ def generate_sub_region_filter():
     sub_region_filter = dcc.Dropdown(
         id='sub_region_filter',
         placeholder="sub region",
-        options=[]
+        options=[],
+        multi=True,
     )
     return sub_region_filter
 
@@ -40,7 +41,8 @@ def generate_country_filter():
     country_filter = dcc.Dropdown(
         id='country_filter',
         placeholder="country",
-        options=[]
+        options=[],
+        multi=True,
     )
     return country_filter
 
@@ -52,7 +54,7 @@ def generate_status_filter(df):
     status_filter = dcc.Dropdown(
         id='status_filter',
         options=unique_status,
-        multi=False,
+        multi=True,
         placeholder="status",
     )
     return status_filter
@@ -65,16 +67,43 @@ def generate_type_filter(df):
     type_filter = dcc.Dropdown(
         id='type_filter',
         options=unique_type,
-        multi=False,
+        multi=True,
         placeholder="type",
     )
     return type_filter
 
 
+def generate_time_mode_filter():
+    """create the toggle between filtering on the start year and on the operating period"""
+    time_mode_filter = dcc.RadioItems(
+        id='time_mode',
+        options=[
+            {'label': 'commissioned', 'value': 'start'},
+            {'label': 'active', 'value': 'active'},
+        ],
+        value='start',  # Default value
+        inline=True,
+        inputStyle={'margin-right': '4px', 'margin-left': '10px'},
+        className='custom_white_text'
+    )
+    return time_mode_filter
+
+
+def generate_export_links():
+    """create the download links of the filtered projects, their href is set by a clientside callback"""
+    export_links = html.Div([
+        html.A("CSV", id='export_csv', href='/export/gwpt.csv', download='gwpt.csv',
+               className='btn btn-secondary btn-sm me-1'),
+        html.A("Parquet", id='export_parquet', href='/export/gwpt.parquet', download='gwpt.parquet',
+               className='btn btn-secondary btn-sm'),
+    ])
+    return export_links
+
+
 def generate_time_slider(df):
     """generate the time slider filter"""
-    y_min = min(df["Start year"].min(), df["Retired year"].min())
-    y_max = max(df["Start year"].max(), df["Retired year"].max())
+    y_min = int(min(df["Start year"].min(), df["Retired year"].min()))
+    y_max = int(max(df["Start year"].max(), df["Retired year"].max()))
     time_slider = dcc.RangeSlider(
         id='time_slider',
         min=y_min,
@@ -0,0 +1,35 @@
+"""
+gunicorn configuration for the pre-fork production server, see wsgi.py
+"""
+
+import gc
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('SERVER_PORT', 12345)}"
+workers = int(os.getenv("WEB_WORKERS", 4))
+threads = int(os.getenv("WEB_THREADS", 4))
+
+# load the app (and the dataset) in the master, the forked workers share its memory copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    """
+    Called in the master after the app has been preloaded. Move all objects that exist now into the permanent
+    generation, so the garbage collectors of the workers never touch (and thereby copy) the shared pages.
+    """
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    """
+    Called in the master when a worker exits, drop its live prometheus samples (only when PROMETHEUS_MULTIPROC_DIR is
+    set, see utils/metrics.py)
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,105 @@
+"""
+this module contains the construction of dash callback requests without a browser
+
+The benchmarks, the load test and the cache warm-up replay interactions by posting the same
+/_dash-update-component payloads the dash renderer sends. The state of the page is a flat dict of 'id.property' ->
+value, its initial values are read from the layout.
+"""
+
+
+def _split(prop_id):
+    """split 'component_id.property' into its parts"""
+    component_id, prop = prop_id.rsplit(".", 1)
+    return component_id, prop
+
+
+def server_callbacks(app):
+    """
+    Find the callbacks that run on the server
+    Args:
+        app: a dash app with its callbacks registered
+    Returns:
+        dict of callback name -> callback_map key, callbacks sharing a function name get their first output appended
+    """
+    callbacks = {key: spec for key, spec in app.callback_map.items() if "callback" in spec}
+    names = {key: spec["callback"].__name__ for key, spec in callbacks.items()}
+    duplicates = {name for name in names.values() if list(names.values()).count(name) > 1}
+
+    named = {}
+    for key, name in names.items():
+        if name in duplicates:
+            name = f"{name}[{_outputs(key)[0]}]"
+        named[name] = key
+    return named
+
+
+def initial_state(app):
+    """
+    Collect the initial value of every callback input and state from the layout
+    Args:
+        app: a dash app with its layout and callbacks
+    Returns:
+        dict of 'id.property' -> value
+    """
+    # a layout function builds the layout of a page load
+    layout = app.layout() if callable(app.layout) else app.layout
+    components = {}
+    for component in [layout, *layout._traverse()]:
+        component_id = getattr(component, "id", None)
+        if isinstance(component_id, str):
+            components[component_id] = component
+
+    state = {}
+    for spec in app.callback_map.values():
+        for dependency in spec["inputs"] + spec["state"]:
+            component = components.get(dependency["id"])
+            state[f'{dependency["id"]}.{dependency["property"]}'] = getattr(component, dependency["property"], None)
+    return state
+
+
+def triggered_callbacks(app, changed):
+    """
+    Find the server callbacks fired by a change of the provided properties
+    Args:
+        app: a dash app
+        changed: iterable of 'id.property'
+    Returns:
+        dict of callback name -> callback_map key, in registration order
+    """
+    changed = set(changed)
+    return {name: key for name, key in server_callbacks(app).items()
+            if any(f'{i["id"]}.{i["property"]}' in changed for i in app.callback_map[key]["inputs"])}
+
+
+def callback_request(app, key, state, changed):
+    """
+    Build the body of a /_dash-update-component request
+    Args:
+        app: a dash app
+        key: the callback_map key of the callback
+        state: dict of 'id.property' -> value, the current values on the page
+        changed: list of 'id.property' that triggered the callback
+    Returns:
+        the request body (a dict to be posted as json)
+    """
+    spec = app.callback_map[key]
+
+    def value(dependency):
+        prop_id = f'{dependency["id"]}.{dependency["property"]}'
+        return {"id": dependency["id"], "property": dependency["property"], "value": state.get(prop_id)}
+
+    outputs = [dict(zip(("id", "property"), _split(output))) for output in _outputs(key)]
+    return {
+        "output": key,
+        "outputs": outputs if key.startswith("..") else outputs[0],
+        "inputs": [value(dependency) for dependency in spec["inputs"]],
+        "state": [value(dependency) for dependency in spec["state"]],
+        "changedPropIds": list(changed),
+    }
+
+
+def _outputs(key):
+    """the 'id.property' outputs of a callback_map key, multi-output keys look like '..a.b...c.d..'"""
+    if key.startswith(".."):
+        return [output.split("@")[0] for output in key[2:-2].split("...")]
+    return [key.split("@")[0]]
@@ -0,0 +1,94 @@
+"""
+this module contains the capacity cube: capacity aggregated by region, status, type and start year at startup
+"""
+
+import numpy as np
+import pandas as pd
+
+
+
+class CapacityCube:
+    """
+    Capacity summed by Region x Status x Installation Type x Start year, with cumulative sums along the year axis.
+
+    The capacity of any year range is the difference of two prefix sums, so the values for all regions are answered
+    with a single lookup and no scan over the project rows. In the 'active' time mode the rows operating during the
+    range come from an interval index and are summed per cell with one bincount.
+    """
+
+    def __init__(self, df, active_index):
+        """
+        Build the cube
+        Args:
+            df: the full (unfiltered) project phase dataframe
+            active_index: IntervalIndex over the operating periods [Start year, Retired year) of its rows
+        """
+        region_codes, self.regions = pd.factorize(df["Region"])
+        status_codes, self.statuses = pd.factorize(df["Status"])
+        type_codes, self.types = pd.factorize(df["Installation Type"])
+        capacity = df["Capacity (MW)"].to_numpy(dtype=float)
+        years = df["Start year"].to_numpy(dtype=float)
+        shape = (len(self.regions), len(self.statuses), len(self.types))
+
+        # cube cell of every row and the operating periods, for the 'active' time mode
+        self.cells = np.ravel_multi_index((region_codes, status_codes, type_codes), shape)
+        self.capacity = capacity
+        self.active_index = active_index
+
+        # totals regardless of the start year, used when no time range is provided
+        self.totals = np.zeros(shape)
+        np.add.at(self.totals, (region_codes, status_codes, type_codes), capacity)
+
+        # per year capacity, rows without a start year are left out as they never match a time range
+        has_year = ~np.isnan(years)
+        self.first_year = int(years[has_year].min()) if has_year.any() else 0
+        n_years = int(years[has_year].max()) - self.first_year + 1 if has_year.any() else 0
+        per_year = np.zeros(shape + (n_years,))
+        year_codes = years[has_year].astype(int) - self.first_year
+        np.add.at(per_year,
+                  (region_codes[has_year], status_codes[has_year], type_codes[has_year], year_codes),
+                  capacity[has_year])
+
+        # prefix sums with a leading zero: capacity of years [a, b] = prefix[..., b + 1] - prefix[..., a]
+        self.prefix = np.zeros(shape + (n_years + 1,))
+        np.cumsum(per_year, axis=-1, out=self.prefix[..., 1:])
+
+    def capacities(self, status, itype, time_range, time_mode="start"):
+        """
+        Compute the capacity of every region for the provided filters
+        Args:
+            status: string or list of strings
+            itype: string or list of strings
+            time_range: tuple (int, int)
+            time_mode: "start" to filter on the start year, "active" to sum the capacity operating during time_range
+
+        Returns:
+            a dict with the capacity per region, and the sum of all regions under the key "Total"
+        """
+        if time_range is None:
+            values = self.totals
+        elif time_mode == "active":
+            active = self.active_index.mask(*time_range)
+            values = np.bincount(self.cells[active], weights=self.capacity[active], minlength=self.totals.size)
+            values = values.reshape(self.totals.shape)
+        else:
+            n_years = self.prefix.shape[-1] - 1
+            lo = min(max(int(time_range[0]) - self.first_year, 0), n_years)
+            hi = min(max(int(time_range[1]) - self.first_year + 1, 0), n_years)
+            values = self.prefix[..., max(hi, lo)] - self.prefix[..., lo]
+
+        values = values[:, self._selection(self.statuses, status)]
+        values = values[:, :, self._selection(self.types, itype)]
+        per_region = values.sum(axis=(1, 2))
+
+        capacities = dict(zip(self.regions, per_region))
+        capacities["Total"] = per_region.sum()
+        return capacities
+
+    @staticmethod
+    def _selection(values, value):
+        """list of indices along a cube axis matching the filter value(s), all indices when there is no filter"""
+        if value is None or len(value) == 0:
+            return list(range(len(values)))
+        selected = {value} if isinstance(value, str) else set(value)
+        return [i for i, v in enumerate(values) if v in selected]
@@ -0,0 +1,130 @@
+"""
+this module contains the clustering pyramid: a grid clustering of the projects for every integer zoom level
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.project_table import ProjectTable
+
+
+class ClusterPyramid:
+    """
+    Grid clusters of the projects for the integer zoom levels 0 up to max_zoom, built once on the unfiltered data.
+
+    For every zoom level each project gets a cluster key: the web mercator grid cell it falls in (cells are cell_px
+    pixels wide at that zoom), combined with its status and installation type. At query time only the keys of the
+    rows in the filter mask are grouped, so every zoom level renders a bounded number of markers.
+    """
+
+    # area column -> the label of a cluster spanning several of its values, e.g. "3 countries"
+    AREA_LABELS = {"Region": "regions", "Subregion": "subregions", "Country": "countries"}
+
+    def __init__(self, df, max_zoom=7, cell_px=40):
+        """
+        Build the pyramid
+        Args:
+            df: the full (unfiltered) project phase dataframe
+            max_zoom: the highest zoom level that is clustered, above it individual projects are shown
+            cell_px: the width of a cluster cell in screen pixels
+        """
+        self.df = df
+        self.max_zoom = max_zoom
+        self.lat = df["Latitude"].to_numpy(dtype=float)
+        self.lon = df["Longitude"].to_numpy(dtype=float)
+        self.capacity = df["Capacity (MW)"].to_numpy(dtype=float)
+
+        # project of every phase row, with the project keys of the bar chart, to count the projects in a cluster
+        self.project_of_row = df.groupby(ProjectTable.KEYS, sort=False, observed=True).ngroup().to_numpy()
+        self.n_projects = int(self.project_of_row.max()) + 1 if len(df) else 0
+
+        # code of the region, subregion and country of every row (missing values get their own code), a cluster cell
+        # can span several of them
+        self.area_codes = {}
+        for column in self.AREA_LABELS:
+            codes, uniques = pd.factorize(df[column])
+            self.area_codes[column] = (codes + 1, len(uniques) + 1)
+
+        # web mercator coordinates in [0, 1)
+        x = (self.lon + 180) / 360
+        sin_lat = np.clip(np.sin(np.radians(self.lat)), -0.9999, 0.9999)
+        y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+        x, y = np.clip(x, 0, 1 - 1e-12), np.clip(y, 0, 1 - 1e-12)
+
+        status_codes, statuses = pd.factorize(df["Status"])
+        type_codes, types = pd.factorize(df["Installation Type"])
+        group_codes = status_codes * len(types) + type_codes
+        n_groups = len(statuses) * len(types)
+
+        # one int64 cluster key per row and zoom level, 512 px tiles span the world at zoom 0
+        self.keys = []
+        for zoom in range(max_zoom + 1):
+            n_cells = int(np.ceil(512 * 2 ** zoom / cell_px))
+            cells = np.floor(y * n_cells).astype(np.int64) * n_cells + np.floor(x * n_cells).astype(np.int64)
+            self.keys.append(cells * n_groups + group_codes)
+
+    def clusters(self, mask, zoom):
+        """
+        Cluster the rows in mask for the provided zoom level
+        Args:
+            mask: numpy boolean array selecting the (filtered) rows
+            zoom: the (fractional) mapbox zoom level, it is rounded down to a level of the pyramid
+
+        Returns:
+            a df with one row per cluster: the summed capacity, the capacity weighted position, the number of projects,
+            the status and type and the region, subregion and country of the projects in the cluster (e.g. "2 countries"
+            when it spans several)
+        """
+        level = min(max(int(np.floor(zoom)), 0), self.max_zoom)
+        positions = np.flatnonzero(mask)
+        _, inverse = np.unique(self.keys[level][positions], return_inverse=True)
+
+        capacity = self.capacity[positions]
+        count = np.bincount(inverse)
+        # a project with several phases in the cluster counts once
+        projects = _distinct(inverse, self.project_of_row[positions], self.n_projects, len(count))
+        weight = np.bincount(inverse, weights=capacity)
+        # clusters without capacity fall back to the plain mean of the positions
+        has_weight = weight > 0
+        lat = np.where(has_weight,
+                       np.bincount(inverse, weights=capacity * self.lat[positions]) / np.where(has_weight, weight, 1),
+                       np.bincount(inverse, weights=self.lat[positions]) / np.maximum(count, 1))
+        lon = np.where(has_weight,
+                       np.bincount(inverse, weights=capacity * self.lon[positions]) / np.where(has_weight, weight, 1),
+                       np.bincount(inverse, weights=self.lon[positions]) / np.maximum(count, 1))
+
+        # the largest project of every cluster: last row of each cluster when sorted on (cluster, capacity)
+        order = np.lexsort((capacity, inverse))
+        last_of_cluster = np.append(np.flatnonzero(np.diff(inverse[order])), len(order) - 1) if len(order) else []
+        largest = positions[order[last_of_cluster]]
+
+        clusters = self.df.iloc[largest][["Region", "Subregion", "Country", "Status", "Installation Type"]]
+        clusters = clusters.reset_index(drop=True)
+        # the capacity is summed over the whole cell: a cluster spanning several areas is labelled with their number
+        for column, plural in self.AREA_LABELS.items():
+            codes, n_codes = self.area_codes[column]
+            n_areas = _distinct(inverse, codes[positions], n_codes, len(count))
+            if np.any(n_areas > 1):
+                labels = clusters[column].to_numpy(dtype=object)
+                labels[n_areas > 1] = [f"{n} {plural}" for n in n_areas[n_areas > 1]]
+                clusters[column] = labels
+        clusters["Capacity (MW)"] = weight
+        clusters["Latitude"] = lat
+        clusters["Longitude"] = lon
+        clusters["Projects"] = projects
+        return clusters
+
+
+def _distinct(inverse, codes, n_codes, n_clusters):
+    """
+    Count the distinct codes per cluster
+    Args:
+        inverse: cluster of every row
+        codes: non-negative integer code of every row, below n_codes
+        n_codes: number of possible codes
+        n_clusters: number of clusters
+    Returns:
+        numpy int array with the number of distinct codes in every cluster
+    """
+    pairs = np.unique(inverse.astype(np.int64) * n_codes + codes)
+    return np.bincount(pairs // n_codes, minlength=n_clusters)
@@ -0,0 +1,82 @@
+"""
+this module contains the loading layer: lean, typed in-memory frames for the dashboard
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# only the columns the dashboard uses
+GWPT_COLUMNS = ["Region", "Subregion", "Country", "Project Name", "Status", "Installation Type",
+                "Capacity (MW)", "Start year", "Retired year", "Latitude", "Longitude"]
+AGG_COLUMNS = ["Region", "Subregion", "Country"]
+GEO_COLUMNS = ["Region", "Subregion", "Country"]
+
+CATEGORICAL_COLUMNS = ["Region", "Subregion", "Country", "Status", "Installation Type", "Project Name"]
+YEAR_COLUMNS = ["Start year", "Retired year"]
+COORDINATE_COLUMNS = ["Latitude", "Longitude"]
+
+
+def optimize_dtypes(df):
+    """
+    Convert the text columns to categoricals, downcast the years to small integers and the coordinates to float32
+    Args:
+        df: a dataframe with (a subset of) the gwpt columns
+    Returns:
+        the same dataframe with compact dtypes
+    """
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif column in YEAR_COLUMNS:
+            # stays float when there are missing years
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+        elif column in COORDINATE_COLUMNS:
+            df[column] = df[column].astype("float32")
+    return df
+
+
+def read_parquet(path, columns):
+    """
+    Read the provided columns of a parquet file into a frame with compact dtypes
+    Args:
+        path: path of the parquet file
+        columns: list of column names to read
+    Returns:
+        a df
+    """
+    return optimize_dtypes(pd.read_parquet(path, columns=columns))
+
+
+def memory_footprint(frames):
+    """
+    Report the memory used by the provided frames
+    Args:
+        frames: dict of name -> df
+    Returns:
+        dict of name -> bytes
+    """
+    footprint = {name: int(frame.memory_usage(index=True, deep=True).sum()) for name, frame in frames.items()}
+    for name, n_bytes in footprint.items():
+        logger.info("%s: %d rows, %.2f MB", name, len(frames[name]), n_bytes / 1024 ** 2)
+    logger.info("total: %.2f MB", sum(footprint.values()) / 1024 ** 2)
+    return footprint
+
+
+def content_hash(paths):
+    """
+    Returns:
+        the sha256 of the names and contents of the provided files, in the provided order
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        path = Path(path)
+        digest.update(path.name.encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 ** 2), b""):
+                digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,98 @@
+"""
+this module contains the dataset: the loaded frames together with all indexes derived from them
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from utils.capacity_cube import CapacityCube
+from utils.cluster_pyramid import ClusterPyramid
+from utils.data_loader import AGG_COLUMNS, GEO_COLUMNS, GWPT_COLUMNS, content_hash, memory_footprint, read_parquet
+from utils.filter_cache import FilterCache
+from utils.filter_index import FilterIndex
+from utils.interval_index import IntervalIndex
+from utils.option_index import OptionIndex
+from utils.project_table import ProjectTable
+from utils.query_backend import create_backend
+from utils.spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data" / "clean"
+
+
+class Dataset:
+    """
+    The frames used by the dashboard and the structures derived from them.
+
+    Everything is built once, before the server starts handling requests. In pre-fork mode this happens in the master
+    process, the workers share the (read-only) numpy buffers copy-on-write. A new release of the data files is loaded
+    into a new Dataset, see utils/dataset_handle.py.
+    """
+
+    def __init__(self, df, agg, geo, filter_cache=None, version="", backend=None):
+        """
+        Build all derived structures
+        Args:
+            df: the project phase dataframe (gwpt)
+            agg: the country level aggregate (gwpt_agg)
+            geo: the region / subregion / country table (geo)
+            filter_cache: optional FilterCache of the filter masks, shared by the data callbacks
+            version: hash of the data files the frames were read from
+            backend: name of the query backend, see utils/query_backend.py, read from QUERY_BACKEND when not provided
+        """
+        self.df = df
+        self.agg = agg
+        self.geo = geo
+        self.version = version
+
+        # operating periods [Start year, Retired year) for the 'active' time mode of the filters and the cards
+        self.active_index = IntervalIndex(df["Start year"].to_numpy(dtype=float),
+                                          df["Retired year"].to_numpy(dtype=float))
+
+        # precomputed filter masks, and a process-wide cache of the masks of recent queries (see QueryState.mask)
+        self.filter_cache = filter_cache
+        self.filter_index = FilterIndex(df, self.active_index)
+
+        # co-occurring filter values for the cascading dropdown options
+        self.option_index = OptionIndex(df)
+
+        # capacity per region, status, type and start year for the continent cards
+        self.capacity_cube = CapacityCube(df, self.active_index)
+
+        # grid over the project coordinates to only send the visible projects at detail zoom levels
+        self.spatial_index = GridIndex(df["Latitude"], df["Longitude"])
+
+        # capacity weighted grid clusters for every zoom level below the detail level
+        self.cluster_pyramid = ClusterPyramid(df)
+
+        # project level rollup for the bar chart and the project name lookup
+        self.project_table = ProjectTable(df)
+
+        # the filters and top projects of the data views, on the indexes above or on a columnar engine
+        self.backend = create_backend(self, backend)
+
+
+def load_dataset(data_dir=DATA_DIR):
+    """
+    Load the clean parquet files and build the dataset
+    Args:
+        data_dir: folder with gwpt.parquet, gwpt_agg.parquet and geo.parquet
+    Returns:
+        a Dataset
+    """
+    data_dir = Path(data_dir)
+    paths = [data_dir / "gwpt.parquet", data_dir / "gwpt_agg.parquet", data_dir / "geo.parquet"]
+    df = read_parquet(paths[0], GWPT_COLUMNS)
+    agg = read_parquet(paths[1], AGG_COLUMNS)
+    geo = read_parquet(paths[2], GEO_COLUMNS)
+    memory_footprint({"gwpt": df, "gwpt_agg": agg, "geo": geo})
+
+    filter_cache = FilterCache(
+        max_entries=int(os.getenv("FILTER_CACHE_ENTRIES", 128)),
+        max_bytes=int(os.getenv("FILTER_CACHE_MB", 256)) * 1024 ** 2,
+    )
+    dataset = Dataset(df, agg, geo, filter_cache=filter_cache, version=content_hash(paths))
+    logger.info("dataset loaded from %s", data_dir)
+    return dataset
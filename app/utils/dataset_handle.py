@@ -0,0 +1,122 @@
+"""
+this module contains the dataset handle: the current version of the dataset, reloaded when the data files change
+
+A refreshed tracker release is picked up without restarting the workers. A watcher thread polls the parquet files in
+the data folder, once they changed (and stopped changing) it loads the new frames and builds all derived indexes in the
+background, then replaces the current dataset with a single reference assignment. A callback reads the current dataset
+once and uses it until it returns, so the requests in flight finish on the old version while new requests already see
+the new one. The old dataset is freed with its last user.
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils.dataset import load_dataset
+
+logger = logging.getLogger(__name__)
+
+
+def files_state(data_dir):
+    """
+    Returns:
+        the name, modification time and size of the parquet files in the folder, changes when a file is rewritten
+    """
+    state = []
+    for path in sorted(Path(data_dir).glob("*.parquet")):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # removed while listing, e.g. replaced by a rename
+            continue
+        state.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(state)
+
+
+class DatasetHandle:
+    """
+    Reference to the current Dataset, swapped atomically when the data files change.
+
+    The swap is a single attribute assignment, readers never see a half built dataset. All per dataset caches (the
+    filter cache, the figure cache keys) are tied to its version, so nothing computed on the old data is served for
+    the new one.
+    """
+
+    def __init__(self, dataset, data_dir=None):
+        """
+        Args:
+            dataset: the initial Dataset
+            data_dir: the folder it was loaded from, the handle never reloads without it
+        """
+        self._dataset = dataset
+        self.data_dir = data_dir
+        self.reloads = 0
+        self._files = files_state(data_dir) if data_dir is not None else ()
+        self._reload_lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._watcher_pid = None
+
+    def get(self):
+        """
+        Returns:
+            the current Dataset, read it once per request and keep using that object
+        """
+        return self._dataset
+
+    @property
+    def version(self):
+        return self._dataset.version
+
+    def reload(self):
+        """
+        Load the data folder and swap the dataset in when its content differs from the current version
+        Returns:
+            True when a new version was swapped in
+        """
+        with self._reload_lock:
+            files = files_state(self.data_dir)
+            dataset = load_dataset(self.data_dir)
+            self._files = files
+            if dataset.version == self._dataset.version:
+                return False
+            previous, self._dataset = self._dataset.version, dataset
+            self.reloads += 1
+        logger.info("dataset version %s replaced by %s", previous[:12], dataset.version[:12])
+        return True
+
+    def watch(self, interval):
+        """
+        Start the watcher thread of this process, a no-op when it already runs. Threads do not survive a fork, so
+        every pre-forked worker starts its own watcher (see create_app).
+        Args:
+            interval: seconds between two polls of the data folder
+        """
+        if self.data_dir is None or self._watcher_pid == os.getpid():
+            return
+        with self._watch_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, args=(interval,), name="dataset-watcher", daemon=True).start()
+
+    def _watch(self, interval):
+        """poll the data folder, reload once a change has been stable for one interval"""
+        pending = None
+        while True:
+            time.sleep(interval)
+            files = files_state(self.data_dir)
+            if files == self._files:
+                pending = None
+            elif files != pending:
+                # the files are (still) being written, wait until they stop changing
+                pending = files
+            else:
+                pending = None
+                try:
+                    self.reload()
+                except Exception:
+                    # keep serving the current version, retried when the files change again
+                    logger.exception("reload of the dataset from %s failed", self.data_dir)
+                    self._files = files
@@ -0,0 +1,140 @@
+"""
+this module contains the streaming export of the filtered projects as csv or parquet
+
+The export takes the same filters as the callbacks, as query arguments of /export/gwpt.<format>. The matching rows
+are looked up as row positions with the query backend and written in batches, every batch is sent as soon as it is
+serialized. Only one batch of rows is copied at a time, so exporting the whole tracker does not double the memory of
+the worker.
+"""
+
+import logging
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Response, abort, request, stream_with_context
+
+from utils.filter_cache import normalize_filters
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+BATCH_ROWS = 5000
+
+
+def export_filters(args):
+    """
+    Read the filters from the query arguments of an export request
+    Args:
+        args: MultiDict with the optional keys continent, sub_region, country, status, itype, start_year, end_year and
+            time_mode, the multi-select filters can be repeated (e.g. country=Belgium&country=France)
+    Returns:
+        the normalized filters, see normalize_filters
+    """
+    time_range = None
+    if args.get("start_year") and args.get("end_year"):
+        time_range = (args["start_year"], args["end_year"])
+    return normalize_filters(args.get("continent") or "Total", args.getlist("sub_region"), args.getlist("country"),
+                             args.getlist("status"), args.getlist("itype"), time_range, args.get("time_mode"))
+
+
+def _batches(positions, batch_rows):
+    """split the row positions into consecutive batches"""
+    for start in range(0, len(positions), batch_rows):
+        yield positions[start:start + batch_rows]
+
+
+def iter_csv(df, positions, batch_rows=BATCH_ROWS):
+    """
+    Serialize the selected rows as csv
+    Args:
+        df: the indexed df
+        positions: integer row positions of the rows to export
+        batch_rows: number of rows per chunk
+    Returns:
+        a generator of str chunks, the header first
+    """
+    yield df.iloc[:0].to_csv(index=False)
+    for batch in _batches(positions, batch_rows):
+        yield df.iloc[batch].to_csv(index=False, header=False)
+
+
+class _ChunkSink:
+    """write-only file object that hands out the bytes written since the previous call of take()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(df, positions, batch_rows=BATCH_ROWS):
+    """
+    Serialize the selected rows as parquet, one row group per batch
+    Args:
+        df: the indexed df
+        positions: integer row positions of the rows to export
+        batch_rows: number of rows per row group
+    Returns:
+        a generator of bytes chunks
+    """
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in _batches(positions, batch_rows):
+            writer.write_table(pa.Table.from_pandas(df.iloc[batch], schema=schema, preserve_index=False))
+            yield sink.take()
+    # the footer is written when the writer closes
+    yield sink.take()
+
+
+def register_export(server, dataset_handle):
+    """
+    Add the /export/gwpt.<format> download route to the flask server
+    Args:
+        server: the flask server of the dash app
+        dataset_handle: the DatasetHandle, the rows of its current dataset are exported in the order of its df. The
+            whole download is served from the version that was current when it started.
+    """
+    serializers = {"csv": iter_csv, "parquet": iter_parquet}
+
+    @server.route("/export/gwpt.<export_format>")
+    def export(export_format):
+        if export_format not in EXPORT_FORMATS:
+            abort(404)
+        try:
+            filters = export_filters(request.args)
+        except ValueError:
+            abort(400)
+
+        dataset = dataset_handle.get()
+        positions = np.flatnonzero(dataset.backend.mask(*filters))
+        logger.info("export of %d rows as %s", len(positions), export_format)
+        chunks = serializers[export_format](dataset.df, positions)
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=gwpt.{export_format}"},
+        )
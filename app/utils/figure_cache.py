@@ -0,0 +1,158 @@
+"""
+this module contains the persistent figure cache and the warm-up of the default views
+
+The serialized figures are stored on disk, content addressed: the file name is the hash of the callback name and its
+normalized inputs, which include the version of the data files, in a folder per version of the app code. A restart (or
+another worker) with the same data and code reads the figures back instead of filtering and building them again. After
+a reload of the data the keys change, the figures of the old version are never read again and age out of the cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import orjson
+from plotly.io.json import to_json_plotly
+
+from utils.callback_requests import callback_request, initial_state, server_callbacks, triggered_callbacks
+from utils.data_loader import content_hash
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+
+def source_version():
+    """
+    Returns:
+        the hash of the python sources of the app, a code change can change the figures of the same inputs
+    """
+    return content_hash(sorted(APP_DIR.rglob("*.py")))
+
+
+class FigureCache:
+    """
+    Content addressed cache of serialized callback results on disk, safe to share between processes.
+
+    A file is written to a temporary name and renamed, readers never see a partial file. When the folder grows beyond
+    max_bytes the least recently written files are removed.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 ** 2):
+        """
+        Args:
+            directory: root folder of the cache, created when missing, the figures of other code versions are removed
+            max_bytes: size limit of the cached files
+        """
+        self.root = Path(directory)
+        self.version = hashlib.sha256(source_version().encode()).hexdigest()[:16]
+        self.directory = self.root / self.version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.root.iterdir():
+            if stale.is_dir() and stale.name != self.version:
+                shutil.rmtree(stale, ignore_errors=True)
+        self.size = sum(path.stat().st_size for path in self.directory.rglob("*.json"))
+
+    def key(self, name, inputs):
+        """
+        Returns:
+            the content address of a callback result: the hash of the callback name and its inputs as canonical json
+        """
+        payload = json.dumps([name, inputs], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get_or_compute(self, name, inputs, compute):
+        """
+        Return the cached result of a callback, compute, serialize and store it on a miss
+        Args:
+            name: name of the cached result, e.g. 'map'
+            inputs: json serializable, normalized inputs that fully determine the result, including the data version
+            compute: function without arguments returning the (plotly json serializable) result
+        Returns:
+            the result, as parsed from its json on a hit
+        """
+        path = self._path(self.key(name, inputs))
+        try:
+            value = orjson.loads(path.read_bytes())
+            with self._lock:
+                self.hits += 1
+            return value
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        data = to_json_plotly(value).encode()
+        path.parent.mkdir(exist_ok=True)
+        temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+        with self._lock:
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self._prune()
+        return value
+
+    def stats(self):
+        """
+        Returns:
+            a dict with the size of the cached files (of all processes sharing the folder, as last counted by this
+            one) and the hit/miss counters of this process
+        """
+        with self._lock:
+            return {"bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+    def _prune(self):
+        """remove the oldest files until the cache is below 3/4 of its size limit"""
+        files = sorted(((path.stat().st_mtime, path.stat().st_size, path) for path in self.directory.rglob("*.json")),
+                       key=lambda file: file[0])
+        self.size = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.size <= self.max_bytes * 3 / 4:
+                break
+            path.unlink(missing_ok=True)
+            self.size -= size
+
+
+def warm_up(app, continents):
+    """
+    Compute the default view and the view of every continent through the server callbacks, like the first page load
+    and a click on a continent card do, so their figures are in the caches before the first user arrives
+    Args:
+        app: a dash app with its callbacks registered
+        continents: the continent names, "Total" being the default view
+    """
+    start = time.perf_counter()
+    client = app.server.test_client()
+    state = initial_state(app)
+    callbacks = {name: key for name, key in server_callbacks(app).items() if not app.callback_map[key].get("long")}
+
+    # the initial page load fires all callbacks, a continent click the ones depending on the clicked continent
+    views = [({}, callbacks)]
+    for continent in continents:
+        if continent != "Total":
+            step = {"last_clicked_continent.data": continent}
+            triggered = triggered_callbacks(app, step)
+            views.append((step, {name: key for name, key in triggered.items() if name in callbacks}))
+
+    for step, view_callbacks in views:
+        for key in view_callbacks.values():
+            body = callback_request(app, key, dict(state, **step), list(step))
+            response = client.post("/_dash-update-component", json=body)
+            if response.status_code not in (200, 204):
+                logger.warning("warm-up of %s failed with status %d", key, response.status_code)
+    logger.info("warm-up of %d views done in %.1f s", len(views), time.perf_counter() - start)
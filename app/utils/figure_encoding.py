@@ -0,0 +1,79 @@
+"""
+this module contains the compact binary encoding of figure payloads
+
+Numeric trace arrays are sent as base64 encoded typed arrays: {"dtype": "f4", "bdata": "...", "shape": [n]}. The
+plotly.js version bundled with dash does not read this format, the decode_figure function in assets/clientside.js
+turns them into javascript typed arrays (which plotly.js accepts) before the figure is handed to the graph.
+"""
+
+import base64
+
+import numpy as np
+
+# numpy dtype -> typed array name used in the payload, float64 is sent as float32 when that is lossless
+DTYPES = {
+    np.dtype("float64"): "f8",
+    np.dtype("float32"): "f4",
+    np.dtype("int64"): "i4",
+    np.dtype("int32"): "i4",
+    np.dtype("int16"): "i2",
+    np.dtype("int8"): "i1",
+    np.dtype("uint8"): "u1",
+    np.dtype("bool"): "u1",
+}
+NUMPY_DTYPES = {"f8": "<f8", "f4": "<f4", "i4": "<i4", "i2": "<i2", "i1": "i1", "u1": "u1"}
+
+
+def encode_array(values):
+    """
+    Encode a 1D numeric array as a base64 typed array
+    Args:
+        values: a numpy array
+    Returns:
+        a dict with the dtype, the base64 data and the shape
+    """
+    dtype = DTYPES[values.dtype]
+    if dtype == "f8" and np.array_equal(values.astype("float32"), values, equal_nan=True):
+        dtype = "f4"
+    elif dtype == "i4" and len(values) and np.abs(values).max() > np.iinfo(np.int32).max:
+        dtype = "f8"
+    data = np.ascontiguousarray(values, dtype=NUMPY_DTYPES[dtype])
+    return {"dtype": dtype, "bdata": base64.b64encode(data.tobytes()).decode("ascii"), "shape": list(data.shape)}
+
+
+def encode_traces(traces, min_length=64):
+    """
+    Replace the long numeric arrays of the provided traces by typed arrays
+    Args:
+        traces: list of plotly traces (graph objects or dicts)
+        min_length: shorter arrays are left as JSON lists, the encoding only pays off for long arrays
+    Returns:
+        a list of trace dicts
+    """
+    return [_encode(trace.to_plotly_json() if hasattr(trace, "to_plotly_json") else trace, min_length)
+            for trace in traces]
+
+
+def encode_figure(fig, min_length=64):
+    """
+    Encode the long numeric arrays in the traces of a figure
+    Args:
+        fig: a plotly figure or a figure dict
+        min_length: shorter arrays are left as JSON lists
+    Returns:
+        a figure dict
+    """
+    figure = fig.to_plotly_json() if hasattr(fig, "to_plotly_json") else dict(fig)
+    figure["data"] = encode_traces(figure["data"], min_length)
+    return figure
+
+
+def _encode(value, min_length):
+    """recursively encode the numeric arrays in a trace (or a nested property of it)"""
+    if isinstance(value, dict):
+        return {key: _encode(item, min_length) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        value = np.asarray(value) if value and all(isinstance(v, (int, float)) for v in value) else value
+    if isinstance(value, np.ndarray) and value.ndim == 1 and value.dtype in DTYPES and len(value) >= min_length:
+        return encode_array(value)
+    return value
@@ -0,0 +1,171 @@
+"""
+this module contains the figure builders of the map and the bar chart
+
+The layout (with the plotly template), colour mapping and hovertemplates are built once. Per request only the traces
+are filled from the numpy arrays of the data, one trace per status, and assembled into a figure dict. This avoids the
+grouping, frame copies and repeated layout updates of plotly express (the figures look the same).
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# based on https://colorbrewer2.org/#type=diverging&scheme=BrBG&n=6
+STATUS_COLORS = {
+    'operating': '#1b9e77',
+    'future': '#7570b3',
+    'retired': '#d95f02',
+}
+STATUS_ORDER = ['operating', 'future', 'retired']
+
+
+def _template():
+    """the layout template of the default plotly theme, like plotly express applies it"""
+    return pio.templates[pio.templates.default].to_plotly_json()
+
+
+class MapFigureBuilder:
+    """
+    Builds the scatter mapbox figure of the projects (detail) or the project clusters
+    """
+
+    # marker area scaling of plotly express, the largest marker has this diameter in px
+    SIZE_MAX = 20
+    DETAIL_HOVER = ["Region", "Subregion", "Country", "Capacity (MW)", "Installation Type"]
+    CLUSTER_HOVER = DETAIL_HOVER + ["Projects"]
+
+    def __init__(self):
+        self.layout = go.Layout(
+            template=_template(),
+            mapbox=dict(domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), style="carto-positron"),
+            legend=dict(title=dict(text="Status"), tracegroupgap=0, itemsizing="constant",
+                        yanchor="top", y=0.955, xanchor="right", x=1),
+            margin=dict(r=0, t=0, l=0, b=0),
+        ).to_plotly_json()
+        self.hovertemplates = {
+            (clustered, status): self._hovertemplate(status, self.CLUSTER_HOVER if clustered else self.DETAIL_HOVER)
+            for clustered in (False, True) for status in STATUS_ORDER
+        }
+
+    @staticmethod
+    def _hovertemplate(status, columns):
+        """hover box like plotly express: name in bold, the status and then the hover columns (capacity first)"""
+        order = ["Capacity (MW)"] + [column for column in columns if column != "Capacity (MW)"]
+        lines = [f"{column}=%{{customdata[{columns.index(column)}]}}" for column in order]
+        return "<b>%{hovertext}</b><br><br>" + "<br>".join([f"Status={status}"] + lines) + "<extra></extra>"
+
+    def build(self, data, zoom, center=None, clustered=False):
+        """
+        Build the map figure
+        Args:
+            data: df with the projects or the clusters (cluster_pyramid.clusters) to draw
+            zoom: mapbox zoom level
+            center: dict with the lat and lon of the map center, the mean position of the data when None
+            clustered: data holds clusters, hovered by country and with the number of projects
+        Returns:
+            a figure dict
+        """
+        columns = self.CLUSTER_HOVER if clustered else self.DETAIL_HOVER
+        lat = data["Latitude"].to_numpy(dtype=float)
+        lon = data["Longitude"].to_numpy(dtype=float)
+        capacity = data["Capacity (MW)"].to_numpy(dtype=float)
+        hovertext = data["Country" if clustered else "Project Name"].to_numpy(dtype=object)
+        customdata = np.column_stack([data[column].to_numpy(dtype=object) for column in columns]) if len(data) \
+            else np.empty((0, len(columns)), dtype=object)
+        status = data["Status"].to_numpy(dtype=object)
+
+        sizeref = capacity.max() / self.SIZE_MAX ** 2 if len(capacity) and capacity.max() > 0 else 1
+        marker = dict(sizemode="area", sizeref=sizeref, sizemin=4 if clustered else 3, opacity=1 if clustered else 0.7)
+
+        traces = []
+        for name in STATUS_ORDER:
+            selection = status == name
+            if not selection.any():
+                continue
+            trace = go.Scattermapbox(
+                lat=lat[selection],
+                lon=lon[selection],
+                customdata=customdata[selection],
+                hovertext=hovertext[selection],
+                hovertemplate=self.hovertemplates[(clustered, name)],
+                marker=dict(marker, color=STATUS_COLORS[name], size=capacity[selection]),
+                mode="markers",
+                name=name,
+                legendgroup=name,
+                showlegend=True,
+                subplot="mapbox",
+            )
+            traces.append(trace.to_plotly_json())
+
+        if center is None and len(data):
+            center = dict(lat=float(lat.mean()), lon=float(lon.mean()))
+        mapbox = dict(self.layout["mapbox"], zoom=zoom)
+        if center is not None:
+            mapbox["center"] = dict(lat=center["lat"], lon=center["lon"])
+        return {"data": traces, "layout": dict(self.layout, mapbox=mapbox)}
+
+
+class BarFigureBuilder:
+    """
+    Builds the horizontal bar chart of the largest projects
+    """
+
+    HOVER = ["Region", "Subregion", "Country"]
+
+    def __init__(self):
+        self.layout = go.Layout(
+            template=_template(),
+            xaxis=dict(anchor="y", domain=[0.0, 1.0], title=None),
+            yaxis=dict(anchor="x", domain=[0.0, 1.0], title=None, categoryorder="total ascending",
+                       tickfont=dict(size=10)),
+            legend=dict(title=dict(text="Status"), tracegroupgap=0, orientation="h",
+                        yanchor="top", y=-0.2, xanchor="right", x=1),
+            title=dict(text="Top 20 Largest Wind Farms <br> Capacity (MW)", x=0.5),
+            barmode="relative",
+            margin=dict(l=220, r=5, b=100, t=100),
+            showlegend=False,
+            autosize=False,
+        ).to_plotly_json()
+        self.hovertemplates = {
+            status: "<br>".join([f"Status={status}", "Capacity (MW)=%{x}", "Project Name=%{y}"]
+                                + [f"{column}=%{{customdata[{i}]}}" for i, column in enumerate(self.HOVER)])
+            + "<extra></extra>"
+            for status in STATUS_ORDER
+        }
+
+    def build(self, projects):
+        """
+        Build the bar chart
+        Args:
+            projects: df with the project keys and their 'Capacity (MW)', in drawing order (bottom bar first)
+        Returns:
+            a figure dict
+        """
+        capacity = projects["Capacity (MW)"].to_numpy(dtype=float)
+        names = projects["Project Name"].to_numpy(dtype=object)
+        customdata = np.column_stack([projects[column].to_numpy(dtype=object) for column in self.HOVER]) \
+            if len(projects) else np.empty((0, len(self.HOVER)), dtype=object)
+        status = projects["Status"].to_numpy(dtype=object)
+
+        traces = []
+        # one trace per status, in order of appearance
+        for name in dict.fromkeys(status):
+            selection = status == name
+            trace = go.Bar(
+                x=capacity[selection],
+                y=names[selection],
+                customdata=customdata[selection],
+                hovertemplate=self.hovertemplates[name],
+                marker=dict(color=STATUS_COLORS[name], pattern=dict(shape="")),
+                orientation="h",
+                name=name,
+                legendgroup=name,
+                offsetgroup=name,
+                alignmentgroup="True",
+                showlegend=True,
+                textposition="auto",
+                xaxis="x",
+                yaxis="y",
+            )
+            traces.append(trace.to_plotly_json())
+        return {"data": traces, "layout": self.layout}
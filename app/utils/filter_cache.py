@@ -0,0 +1,106 @@
+"""
+this module contains a process-wide LRU cache for the filter masks, shared by all callbacks and sessions
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def normalize_filters(continent, sub_region, country, status, itype, time_range, time_mode="start"):
+    """
+    Turn the raw filter values coming from the dash components into a hashable cache key.
+    Empty strings, empty lists and None are equivalent, the values of a multi-select become a sorted tuple (a single
+    value its string) and the time range becomes a tuple of ints.
+    Returns:
+        a tuple (continent, sub_region, country, status, itype, time_range, time_mode)
+    """
+    def clean(value):
+        if isinstance(value, (list, tuple)):
+            values = sorted(set(value))
+            return values[0] if len(values) == 1 else tuple(values) or None
+        return None if value is None or value == "" else value
+
+    if time_range is not None:
+        time_range = (int(time_range[0]), int(time_range[1]))
+    return continent, clean(sub_region), clean(country), clean(status), clean(itype), time_range, time_mode or "start"
+
+
+class FilterCache:
+    """
+    Bounded LRU cache for the row masks of the filters.
+
+    Entries are evicted in least recently used order when either the number of entries or the total memory of the
+    cached masks exceeds its limit. Cached masks are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 ** 2):
+        """
+        Args:
+            max_entries: maximum number of cached results
+            max_bytes: maximum total memory (in bytes) of the cached results
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.n_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, n_bytes)
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, or compute, store and return it
+        Args:
+            key: hashable key, the data version and the normalized filters (see normalize_filters)
+            compute: function without arguments that returns a numpy array
+        Returns:
+            the (possibly cached) array
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # compute outside of the lock, two threads may compute the same key but the result is identical
+        value = compute()
+        n_bytes = int(value.nbytes)
+        if n_bytes > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, n_bytes)
+                self.n_bytes += n_bytes
+                self._evict()
+        return value
+
+    def clear(self):
+        """drop all cached entries, the counters are kept"""
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            a dict with the current size and the hit/miss/eviction counters
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.n_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self):
+        """drop least recently used entries until both limits are respected, the lock must be held"""
+        while len(self._entries) > self.max_entries or self.n_bytes > self.max_bytes:
+            _, (_, n_bytes) = self._entries.popitem(last=False)
+            self.n_bytes -= n_bytes
+            self.evictions += 1
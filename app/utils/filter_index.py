@@ -0,0 +1,114 @@
+"""
+this module contains the filter index: precomputed boolean masks that replace the copy-and-chain filtering
+"""
+
+import numpy as np
+import pandas as pd
+
+
+
+class FilterIndex:
+    """
+    Filter engine that is built once at startup for a given dataframe.
+
+    The categorical filter columns are stored as integer category codes. A filter on one or more values is a lookup
+    table over the codes, indexed with the code of every row, so selecting many values costs the same as one. The start
+    year range is answered from a year-sorted position array, the 'active' time mode from an interval index over the
+    operating period. A query ANDs the relevant masks together and only slices the dataframe once.
+    """
+
+    # maps the filter arguments onto the dataframe columns they act on
+    CATEGORICAL_COLUMNS = {
+        "continent": "Region",
+        "sub_region": "Subregion",
+        "country": "Country",
+        "status": "Status",
+        "itype": "Installation Type",
+    }
+    YEAR_COLUMN = "Start year"
+    END_YEAR_COLUMN = "Retired year"
+    # start: commissioned during the time range, active: operating at some point during the time range
+    TIME_MODES = ("start", "active")
+
+    def __init__(self, df, active_index):
+        """
+        Build the index
+        Args:
+            df: the full (unfiltered) project phase dataframe
+            active_index: IntervalIndex over the operating periods [Start year, Retired year) of its rows
+        """
+        self.df = df
+        self.n_rows = len(df)
+
+        # integer category code of every row and the code of every value, per categorical filter column
+        self.codes = {}
+        self.code_of = {}
+        for column in self.CATEGORICAL_COLUMNS.values():
+            codes, uniques = pd.factorize(df[column])
+            # missing values get code -1, the last entry of the lookup tables, which is never selected. Native integers
+            # index the lookup tables about 3 times faster than small ones
+            self.codes[column] = codes.astype(np.intp)
+            self.code_of[column] = {value: code for code, value in enumerate(uniques)}
+
+        # row positions sorted on start year, NaN years end up last and never match a range
+        years = df[self.YEAR_COLUMN].to_numpy(dtype=float)
+        self.year_order = np.argsort(years, kind="stable")
+        self.sorted_years = years[self.year_order]
+
+        # operating periods for the 'active' time mode
+        self.active_index = active_index
+
+    def mask(self, continent, sub_region, country, status, itype, time_range, time_mode="start"):
+        """
+        Compute the boolean row mask for the provided filters
+        Args:
+            continent: string, "Total" means no filter
+            sub_region: string or list of strings
+            country: string or list of strings
+            status: string or list of strings
+            itype: string or list of strings
+            time_range: tuple (int, int)
+            time_mode: "start" to filter on the start year, "active" to select the rows operating during time_range
+
+        Returns:
+            a numpy boolean array with one entry per row of the indexed df
+        """
+        mask = np.ones(self.n_rows, dtype=bool)
+
+        if continent != "Total":
+            mask &= self._value_mask("Region", continent)
+
+        for column, value in [("Subregion", sub_region),
+                              ("Country", country),
+                              ("Status", status),
+                              ("Installation Type", itype)]:
+            if value is not None and len(value):
+                mask &= self._value_mask(column, value)
+
+        if time_range is not None and time_mode == "active":
+            mask &= self.active_index.mask(*time_range)
+        elif time_range is not None:
+            mask &= self._year_mask(*time_range)
+
+        return mask
+
+    def positions(self, continent, sub_region, country, status, itype, time_range, time_mode="start"):
+        """
+        Same as mask, but returns the (sorted) integer row positions of the matching rows
+        """
+        return np.flatnonzero(self.mask(continent, sub_region, country, status, itype, time_range, time_mode))
+
+    def _value_mask(self, column, value):
+        """mask of the rows whose value is value (or one of the values in a list), unknown values match no rows"""
+        values = [value] if isinstance(value, str) else value
+        selected = np.zeros(len(self.code_of[column]) + 1, dtype=bool)
+        selected[[self.code_of[column][v] for v in values if v in self.code_of[column]]] = True
+        return selected[self.codes[column]]
+
+    def _year_mask(self, start_year, end_year):
+        """mask for start_year <= Start year <= end_year, using two binary searches on the sorted years"""
+        lo = np.searchsorted(self.sorted_years, start_year, side="left")
+        hi = np.searchsorted(self.sorted_years, end_year, side="right")
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.year_order[lo:hi]] = True
+        return mask
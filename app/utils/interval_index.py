@@ -0,0 +1,71 @@
+"""
+this module contains the interval index over the operating period [Start year, Retired year) of the project phases
+"""
+
+import numpy as np
+
+
+class IntervalIndex:
+    """
+    Index of the half-open intervals [start, end) of all rows.
+
+    A row is active during the years [first, last] when start <= last and end > first. The rows starting no later than
+    last are a prefix of the start-sorted rows, the rows ended by first are a prefix of the end-sorted rows, so an
+    overlap query takes two binary searches and only touches the matching rows.
+    """
+
+    def __init__(self, start, end):
+        """
+        Build the index
+        Args:
+            start: array-like with the first year of every row
+            end: array-like with the (excluded) end year of every row
+        """
+        self.start = np.asarray(start, dtype=float)
+        self.end = np.asarray(end, dtype=float)
+        self.n_rows = len(self.start)
+        self.start_order = np.argsort(self.start, kind="stable")
+        self.sorted_start = self.start[self.start_order]
+        self.end_order = np.argsort(self.end, kind="stable")
+        self.sorted_end = self.end[self.end_order]
+
+    def mask(self, first_year, last_year):
+        """
+        Rows active during the years [first_year, last_year]
+        Returns:
+            a numpy boolean array with one entry per row
+        """
+        started = np.searchsorted(self.sorted_start, last_year, side="right")
+        ended = np.searchsorted(self.sorted_end, first_year, side="right")
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.start_order[:started]] = True
+        mask[self.end_order[:ended]] = False
+        return mask
+
+    def capacity_over_time(self, capacity, mask=None, first_year=None, last_year=None):
+        """
+        Active capacity per year with an event sweep: the capacity is added in the start year, subtracted in the end
+        year and the events are summed cumulatively
+        Args:
+            capacity: numpy array with the capacity of every row
+            mask: optional numpy boolean array selecting the rows
+            first_year: first year of the series, the first start year when None
+            last_year: last year of the series, the last end year when None
+        Returns:
+            (years, capacities) numpy arrays
+        """
+        # rows without a start year are never active, rows without an end year never end
+        selected = ~np.isnan(self.start) if mask is None else mask & ~np.isnan(self.start)
+        start, end, capacity = self.start[selected], self.end[selected], capacity[selected]
+        if first_year is None:
+            first_year = int(start.min()) if len(start) else 0
+        if last_year is None:
+            last_year = int(np.nanmax(np.append(end, first_year)))
+        n_years = last_year - first_year + 1
+
+        # rows starting before the series are active from its first year, ends after the series are never reached
+        starts = np.clip(start - first_year, 0, n_years).astype(int)
+        ends = np.clip(np.nan_to_num(end - first_year, nan=n_years), 0, n_years).astype(int)
+        events = np.bincount(starts, weights=capacity, minlength=n_years + 1)
+        events -= np.bincount(ends, weights=capacity, minlength=n_years + 1)
+        return np.arange(first_year, last_year + 1), np.cumsum(events)[:n_years]
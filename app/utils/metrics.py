@@ -0,0 +1,154 @@
+"""
+this module contains the callback instrumentation and the prometheus /metrics endpoint
+
+Every server callback is wrapped to record its wall time, serialized output size and trigger. Inside a callback the
+filter and figure build portions are timed with the phase() context manager.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from utils.callback_requests import server_callbacks
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6)
+
+CALLBACK_SECONDS = Histogram("dash_callback_duration_seconds", "Wall time of a dash callback",
+                             ["callback"], buckets=LATENCY_BUCKETS)
+PHASE_SECONDS = Histogram("dash_callback_phase_seconds", "Time spent in a phase (filter, figure) of a dash callback",
+                          ["callback", "phase"], buckets=LATENCY_BUCKETS)
+OUTPUT_BYTES = Histogram("dash_callback_output_bytes", "Serialized output size of a dash callback",
+                         ["callback"], buckets=SIZE_BUCKETS)
+TRIGGERS = Counter("dash_callback_triggers", "Dash callback calls per triggering property", ["callback", "trigger"])
+SLOW_CALLBACKS = Counter("dash_callback_slow", "Dash callback calls above the slow threshold", ["callback"])
+
+# phase name -> seconds of the callback running in the current context
+_phases = contextvars.ContextVar("callback_phases", default=None)
+# names of the phases that are being timed in the current context
+_open_phases = contextvars.ContextVar("open_phases", default=frozenset())
+
+
+@contextmanager
+def phase(name):
+    """
+    Time a portion of a callback, e.g. `with phase("filter"): ...`. Does nothing outside an instrumented callback.
+    A phase nested in a phase with the same name (e.g. the mask of a QueryState computed inside a filter phase of a
+    view) is already timed by the outer one and is not counted twice.
+    """
+    phases = _phases.get()
+    open_phases = _open_phases.get()
+    if phases is None or name in open_phases:
+        yield
+        return
+    token = _open_phases.set(open_phases | {name})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+        _open_phases.reset(token)
+
+
+class DatasetCollector:
+    """Exposes the dataset reloads and the counters of the FilterCache of the current dataset at scrape time"""
+
+    def __init__(self, dataset_handle):
+        self.dataset_handle = dataset_handle
+
+    def collect(self):
+        yield GaugeMetricFamily("dataset_reloads", "Dataset versions swapped in since start",
+                                value=self.dataset_handle.reloads)
+        filter_cache = self.dataset_handle.get().filter_cache
+        if filter_cache is None:
+            return
+        for name, value in filter_cache.stats().items():
+            yield GaugeMetricFamily(f"filter_cache_{name}", f"Filter cache {name}", value=value)
+
+
+class FigureCacheCollector:
+    """Exposes the size and the hit/miss counters of the FigureCache at scrape time"""
+
+    def __init__(self, figure_cache):
+        self.figure_cache = figure_cache
+
+    def collect(self):
+        for name, value in self.figure_cache.stats().items():
+            yield GaugeMetricFamily(f"figure_cache_{name}", f"Figure cache {name}", value=value)
+
+
+def _instrument(name, func, slow_ms):
+    """wrap a dash callback function to record its metrics"""
+    @wraps(func)
+    def instrumented(*args, **kwargs):
+        phases = {}
+        token = _phases.set(phases)
+        start = time.perf_counter()
+        try:
+            output = func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _phases.reset(token)
+
+        changed = (request.get_json(silent=True) or {}).get("changedPropIds") or []
+        trigger = changed[0] if changed else "initial"
+        n_bytes = len(output) if isinstance(output, (str, bytes)) else 0
+
+        CALLBACK_SECONDS.labels(name).observe(elapsed)
+        OUTPUT_BYTES.labels(name).observe(n_bytes)
+        TRIGGERS.labels(name, trigger).inc()
+        for phase_name, seconds in phases.items():
+            PHASE_SECONDS.labels(name, phase_name).observe(seconds)
+
+        if elapsed * 1000 >= slow_ms:
+            SLOW_CALLBACKS.labels(name).inc()
+            timings = ", ".join(f"{phase_name} {seconds * 1000:.0f} ms" for phase_name, seconds in phases.items())
+            logger.warning("slow callback %s: %.0f ms (%s), %d bytes, trigger %s",
+                           name, elapsed * 1000, timings or "no phases", n_bytes, trigger)
+        return output
+
+    return instrumented
+
+
+def register_metrics(app, dataset_handle=None, figure_cache=None, slow_ms=None):
+    """
+    Instrument all server callbacks of the app and add the /metrics route to its flask server
+    Args:
+        app: a dash app with its callbacks registered
+        dataset_handle: optional DatasetHandle, its reloads and the counters of its filter cache are exported
+        figure_cache: optional FigureCache, its size and hit/miss counters are exported
+        slow_ms: callbacks taking longer are logged as a warning, read from SLOW_CALLBACK_MS when not provided
+    """
+    if slow_ms is None:
+        slow_ms = float(os.getenv("SLOW_CALLBACK_MS", 500))
+
+    for name, key in server_callbacks(app).items():
+        spec = app.callback_map[key]
+        spec["callback"] = _instrument(name, spec["callback"], slow_ms)
+
+    registry = CollectorRegistry()
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # gunicorn workers write their samples to this folder, the worker serving the scrape aggregates them
+        from prometheus_client import multiprocess
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        for collector in (CALLBACK_SECONDS, PHASE_SECONDS, OUTPUT_BYTES, TRIGGERS, SLOW_CALLBACKS):
+            registry.register(collector)
+    if dataset_handle is not None:
+        # the cache lives in each worker, the scrape reports the one of the worker serving it
+        registry.register(DatasetCollector(dataset_handle))
+    if figure_cache is not None:
+        registry.register(FigureCacheCollector(figure_cache))
+
+    @app.server.route("/metrics")
+    def metrics():
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
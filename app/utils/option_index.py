@@ -0,0 +1,104 @@
+"""
+this module contains the option index: the co-occurrence structure behind the cascading dropdown options
+"""
+
+import numpy as np
+
+from utils.filter_index import FilterIndex
+
+
+class OptionIndex:
+    """
+    Co-occurrence index of the filter values, built once at load time.
+
+    Every distinct (Region, Subregion, Country, Status, Installation Type, Start year, Retired year) combination in the
+    data gets a bit, the combinations are numbered in start year order. For every value of a filter column the index
+    keeps the set of combinations it occurs in as a python int bitset. The options of a dropdown are the values whose
+    set intersects the set selected by the other filters, no rows are filtered or materialized.
+    """
+
+    CATEGORICAL_COLUMNS = FilterIndex.CATEGORICAL_COLUMNS
+    YEAR_COLUMN = FilterIndex.YEAR_COLUMN
+    END_YEAR_COLUMN = FilterIndex.END_YEAR_COLUMN
+
+    def __init__(self, df):
+        """
+        Build the index
+        Args:
+            df: the full (unfiltered) project phase dataframe
+        """
+        columns = list(self.CATEGORICAL_COLUMNS.values())
+        combinations = df[columns + [self.YEAR_COLUMN, self.END_YEAR_COLUMN]].drop_duplicates()
+        combinations = combinations.sort_values(self.YEAR_COLUMN, kind="stable").reset_index(drop=True)
+        self.n_combinations = len(combinations)
+        self.all = (1 << self.n_combinations) - 1
+
+        # the combinations of a year range are a contiguous run of bits
+        self.years = combinations[self.YEAR_COLUMN].to_numpy(dtype=float)
+
+        # for the 'active' time mode: the combinations retired up to and including each retired year
+        end_years = combinations[self.END_YEAR_COLUMN].to_numpy(dtype=float)
+        self.end_years = np.unique(end_years)
+        self.ended_by = [self._bitset(end_years <= year) for year in self.end_years]
+
+        self.sets = {}
+        for column in columns:
+            values = combinations[column].to_numpy(dtype=object)
+            self.sets[column] = {value: self._bitset(values == value) for value in sorted(set(values))}
+
+    @staticmethod
+    def _bitset(flags):
+        """pack a boolean array into an int with bit i set when flags[i] is True"""
+        return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+    def _union(self, column, value):
+        """the combinations of a value, or of any of the values in a list"""
+        sets = self.sets[column]
+        if isinstance(value, str):
+            return sets.get(value, 0)
+        union = 0
+        for v in value:
+            union |= sets.get(v, 0)
+        return union
+
+    def selection(self, continent="Total", sub_region=None, country=None, status=None, itype=None, time_range=None,
+                  time_mode="start"):
+        """
+        Compute the set of combinations matching the provided filters, the arguments are those of FilterIndex.mask
+        Returns:
+            an int bitset
+        """
+        selected = self.all
+        for argument, value in [("continent", None if continent == "Total" else continent),
+                                ("sub_region", sub_region),
+                                ("country", country),
+                                ("status", status),
+                                ("itype", itype)]:
+            if value is not None and len(value):
+                selected &= self._union(self.CATEGORICAL_COLUMNS[argument], value)
+
+        if time_range is not None and time_mode == "active":
+            # started by the end of the range and not retired before its start
+            started = int(np.searchsorted(self.years, time_range[1], side="right"))
+            selected &= (1 << started) - 1
+            ended = int(np.searchsorted(self.end_years, time_range[0], side="right"))
+            if ended:
+                selected &= ~self.ended_by[ended - 1]
+        elif time_range is not None:
+            lo = int(np.searchsorted(self.years, time_range[0], side="left"))
+            hi = int(np.searchsorted(self.years, time_range[1], side="right"))
+            selected &= ((1 << hi) - 1) ^ ((1 << lo) - 1)
+        return selected
+
+    def options(self, column, continent="Total", sub_region=None, country=None, status=None, itype=None,
+                time_range=None, time_mode="start"):
+        """
+        List the values of a column that occur together with the provided filters
+        Args:
+            column: the dataframe column of the dropdown, e.g. 'Status'
+            other arguments: the filters, see FilterIndex.mask
+        Returns:
+            the sorted list of values
+        """
+        selected = self.selection(continent, sub_region, country, status, itype, time_range, time_mode)
+        return [value for value, occurrences in self.sets[column].items() if occurrences & selected]
@@ -0,0 +1,49 @@
+"""
+this module contains the response compression and the payload size logging of the flask server
+"""
+
+import gzip
+import logging
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/html", "text/css", "application/javascript")
+
+
+def callback_output_id():
+    """
+    Returns:
+        the output id (e.g. 'main_map.figure') of the dash callback served by the current request, or None
+    """
+    if not request.path.endswith("/_dash-update-component"):
+        return None
+    body = request.get_json(silent=True) or {}
+    return body.get("output")
+
+
+def register_payload_hooks(server, min_size=1024, compress_level=5):
+    """
+    Gzip the responses the client accepts compressed and log the payload bytes of every dash callback
+    Args:
+        server: the flask server of the dash app
+        min_size: smaller responses are sent as is
+        compress_level: gzip compression level, low levels are much faster at a small cost in size
+    """
+    @server.after_request
+    def compress_response(response):
+        if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers:
+            return response
+
+        raw_size = response.content_length or 0
+        if (raw_size >= min_size and response.mimetype in COMPRESSIBLE_MIMETYPES
+                and "gzip" in request.headers.get("Accept-Encoding", "").lower()):
+            response.set_data(gzip.compress(response.get_data(), compresslevel=compress_level))
+            response.headers["Content-Encoding"] = "gzip"
+            response.headers["Vary"] = "Accept-Encoding"
+
+        output_id = callback_output_id()
+        if output_id is not None:
+            logger.debug("callback %s: %d bytes, %d bytes sent", output_id, raw_size, response.content_length or 0)
+        return response
@@ -0,0 +1,66 @@
+"""
+this module contains the project table: the project level rollup of the phase rows and a project name index
+"""
+
+import numpy as np
+
+
+class ProjectTable:
+    """
+    Project level table (phases combined) built once at load time.
+
+    Every phase row knows the project it belongs to, so the project capacities of any filter mask are a single
+    weighted bincount over the phase rows, followed by a partial sort for the top N.
+    """
+
+    KEYS = ["Region", "Subregion", "Country", "Installation Type", "Project Name", "Status"]
+
+    def __init__(self, df):
+        """
+        Build the table
+        Args:
+            df: the full (unfiltered) project phase dataframe
+        """
+        groups = df.groupby(self.KEYS, sort=True, observed=True)
+        self.projects = groups.size().reset_index()[self.KEYS]
+        self.project_of_row = groups.ngroup().to_numpy()
+        self.capacity = df["Capacity (MW)"].to_numpy(dtype=float)
+
+        # hash index from project name to the row positions of its phases
+        self.name_index = df.groupby("Project Name", sort=False, observed=True).indices
+
+    def top(self, mask, n=20):
+        """
+        Find the n largest projects among the rows in mask, projects are summed over their selected phases
+        Args:
+            mask: numpy boolean array selecting the (filtered) phase rows
+            n: number of projects to return
+
+        Returns:
+            a df with the project keys and the summed 'Capacity (MW)', sorted on descending capacity
+        """
+        projects = self.project_of_row[mask]
+        totals = np.bincount(projects, weights=self.capacity[mask], minlength=len(self.projects))
+        present = np.flatnonzero(np.bincount(projects, minlength=len(self.projects)))
+        totals = totals[present]
+
+        # partial sort, ties at the cut-off keep the first projects like DataFrame.nlargest
+        if len(present) > n:
+            kth = np.partition(totals, len(totals) - n)[len(totals) - n]
+            larger = np.flatnonzero(totals > kth)
+            ties = np.flatnonzero(totals == kth)[:n - len(larger)]
+            selected = np.concatenate([larger, ties])
+        else:
+            selected = np.arange(len(present))
+        selected = selected[np.lexsort((selected, -totals[selected]))]
+
+        top = self.projects.iloc[present[selected]].reset_index(drop=True)
+        top["Capacity (MW)"] = totals[selected]
+        return top
+
+    def rows_for(self, project_name):
+        """
+        Returns:
+            the sorted row positions of the phases of a project, empty when the project is unknown
+        """
+        return self.name_index.get(project_name, np.empty(0, dtype=int))
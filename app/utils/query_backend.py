@@ -0,0 +1,247 @@
+"""
+this module contains the query backends: the filter and the top projects aggregation behind the data views
+
+The backend is chosen with QUERY_BACKEND:
+- index (default): the precomputed numpy indexes (FilterIndex, ProjectTable), fastest on a single release
+- arrow: vectorized pyarrow compute kernels over an arrow table of the dataset, running on the arrow thread pool
+- duckdb: SQL on an in-process duckdb database with the dataset loaded as a native table, parallel over all cores.
+  duckdb is an optional dependency (pip install duckdb)
+
+All backends answer the same queries with the same results, see benchmarks/check_backends.py. The rows are the rows of
+the dataset df in the same order, so a mask of any backend can be used with the other indexes of the dataset.
+"""
+
+import os
+import threading
+from functools import reduce
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.project_table import ProjectTable
+
+CATEGORICAL_COLUMNS = ["Subregion", "Country", "Status", "Installation Type"]
+YEAR_COLUMN = "Start year"
+END_YEAR_COLUMN = "Retired year"
+CAPACITY_COLUMN = "Capacity (MW)"
+
+
+def _values(value):
+    """the values of a single or multi-select filter as a list"""
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _selected(value):
+    return value is not None and len(value) > 0
+
+
+class IndexBackend:
+    """The numpy indexes of the dataset, built at load time"""
+
+    name = "index"
+
+    def __init__(self, dataset):
+        self.filter_index = dataset.filter_index
+        self.project_table = dataset.project_table
+
+    def mask(self, continent, sub_region, country, status, itype, time_range, time_mode="start"):
+        """
+        Compute the boolean row mask for the provided filters, see FilterIndex.mask
+        Returns:
+            a numpy boolean array with one entry per row of the dataset df
+        """
+        return self.filter_index.mask(continent, sub_region, country, status, itype, time_range, time_mode)
+
+    def top(self, query, n=20):
+        """
+        Find the n largest projects selected by a query, projects are summed over their selected phases
+        Args:
+            query: QueryState, the backends working on the mask take its (shared) mask
+            n: number of projects to return
+        Returns:
+            a df with the project keys and the summed 'Capacity (MW)', sorted on descending capacity
+        """
+        return self.project_table.top(query.mask, n)
+
+
+class ArrowBackend:
+    """pyarrow compute kernels over the columns of the dataset"""
+
+    name = "arrow"
+
+    def __init__(self, dataset, threads=None):
+        """
+        Args:
+            dataset: the Dataset
+            threads: size of the arrow cpu thread pool, all cores when not provided
+        """
+        if threads:
+            pa.set_cpu_count(threads)
+        columns = ["Region"] + CATEGORICAL_COLUMNS + ["Project Name", CAPACITY_COLUMN, YEAR_COLUMN, END_YEAR_COLUMN]
+        self.table = pa.Table.from_pandas(dataset.df[columns], preserve_index=False)
+
+    def _condition(self, column, value):
+        """the rows whose value is one of the provided values, the dictionary encoded column is compared on its codes"""
+        return pc.is_in(self.table[column], value_set=pa.array(_values(value), pa.string()))
+
+    def mask(self, continent, sub_region, country, status, itype, time_range, time_mode="start"):
+        """
+        Compute the boolean row mask for the provided filters, see FilterIndex.mask
+        Returns:
+            a numpy boolean array with one entry per row of the dataset df
+        """
+        conditions = []
+        if continent != "Total":
+            conditions.append(self._condition("Region", continent))
+        for column, value in zip(CATEGORICAL_COLUMNS, (sub_region, country, status, itype)):
+            if _selected(value):
+                conditions.append(self._condition(column, value))
+
+        if time_range is not None:
+            first_year, last_year = time_range
+            start, end = self.table[YEAR_COLUMN], self.table[END_YEAR_COLUMN]
+            if time_mode == "active":
+                # operating during [first_year, last_year]: started and not yet retired, no retired year never ends
+                conditions.append(pc.less_equal(start, last_year))
+                conditions.append(pc.or_kleene(pc.is_null(end), pc.greater(end, first_year)))
+            else:
+                conditions.append(pc.less_equal(first_year, start))
+                conditions.append(pc.less_equal(start, last_year))
+
+        if not conditions:
+            return np.ones(self.table.num_rows, dtype=bool)
+        # missing values match no filter
+        mask = pc.fill_null(reduce(pc.and_kleene, conditions), False)
+        return mask.to_numpy(zero_copy_only=False)
+
+    def top(self, query, n=20):
+        """
+        Find the n largest projects selected by a query, see IndexBackend.top
+        """
+        keys = ProjectTable.KEYS
+        totals = (self.table.filter(pa.array(query.mask))
+                  .group_by(keys)
+                  .aggregate([(CAPACITY_COLUMN, "sum")])
+                  .rename_columns(keys + [CAPACITY_COLUMN]))
+        # ties are ordered on the category codes of the project keys, like the groups of the project table
+        sort_keys = {key: totals[key].combine_chunks().indices for key in keys}
+        sort_table = pa.table(dict(sort_keys, **{CAPACITY_COLUMN: totals[CAPACITY_COLUMN]}))
+        order = pc.sort_indices(sort_table, [(CAPACITY_COLUMN, "descending")] + [(key, "ascending") for key in keys])
+        return totals.take(order[:n]).to_pandas()
+
+
+class DuckDBBackend:
+    """SQL on an in-process duckdb database"""
+
+    name = "duckdb"
+
+    def __init__(self, dataset, threads=None):
+        """
+        Args:
+            dataset: the Dataset
+            threads: number of duckdb worker threads, all cores when not provided
+        """
+        import duckdb
+
+        self._duckdb = duckdb
+        self.threads = threads
+        self.n_rows = len(dataset.df)
+        columns = ["Region"] + CATEGORICAL_COLUMNS + ["Project Name", CAPACITY_COLUMN, YEAR_COLUMN, END_YEAR_COLUMN]
+        self.table = pa.Table.from_pandas(dataset.df[columns], preserve_index=False)
+        self.table = self.table.append_column("row", pa.array(np.arange(self.n_rows)))
+        self._database = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _cursor(self):
+        """
+        The duckdb connection of the calling thread. The database is created on first use in every process: its
+        threads do not survive a fork, so a pre-forked worker never uses the one of the master.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    config = {"threads": self.threads} if self.threads else {}
+                    database = self._duckdb.connect(config=config)
+                    database.register("dataset_table", self.table)
+                    # a native table: duckdb scans its own columnar storage in parallel
+                    database.execute("CREATE TABLE gwpt AS SELECT * FROM dataset_table")
+                    database.unregister("dataset_table")
+                    # the cursors of the threads are reset before the new database becomes visible
+                    self._local = threading.local()
+                    self._database, self._pid = database, os.getpid()
+        if getattr(self._local, "cursor", None) is None:
+            # a connection is not safe to share between threads, every thread gets its own cursor
+            self._local.cursor = self._database.cursor()
+        return self._local.cursor
+
+    @staticmethod
+    def _where(continent, sub_region, country, status, itype, time_range, time_mode="start"):
+        """
+        Returns:
+            the sql where clause of the filters and its parameters
+        """
+        conditions, parameters = ["TRUE"], []
+        if continent != "Total":
+            conditions.append('"Region"::VARCHAR = ?')
+            parameters.append(continent)
+        for column, value in zip(CATEGORICAL_COLUMNS, (sub_region, country, status, itype)):
+            if _selected(value):
+                conditions.append(f'list_contains(?, "{column}"::VARCHAR)')
+                parameters.append(_values(value))
+
+        if time_range is not None and time_mode == "active":
+            conditions.append(f'"{YEAR_COLUMN}" <= ? AND ("{END_YEAR_COLUMN}" IS NULL OR "{END_YEAR_COLUMN}" > ?)')
+            parameters.extend([time_range[1], time_range[0]])
+        elif time_range is not None:
+            conditions.append(f'"{YEAR_COLUMN}" BETWEEN ? AND ?')
+            parameters.extend(time_range)
+        return " AND ".join(conditions), parameters
+
+    def mask(self, continent, sub_region, country, status, itype, time_range, time_mode="start"):
+        """
+        Compute the boolean row mask for the provided filters, see FilterIndex.mask
+        Returns:
+            a numpy boolean array with one entry per row of the dataset df
+        """
+        where, parameters = self._where(continent, sub_region, country, status, itype, time_range, time_mode)
+        rows = self._cursor().execute(f"SELECT row FROM gwpt WHERE {where}", parameters).fetchnumpy()["row"]
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def top(self, query, n=20):
+        """
+        Find the n largest projects selected by a query, see IndexBackend.top. Filters and aggregates in a single
+        query, the mask of the query is not needed.
+        """
+        where, parameters = self._where(*query.filters)
+        keys = ", ".join(f'"{key}"' for key in ProjectTable.KEYS)
+        sql = (f'SELECT {keys}, sum("{CAPACITY_COLUMN}") AS "{CAPACITY_COLUMN}" FROM gwpt WHERE {where} '
+               f'GROUP BY {keys} ORDER BY "{CAPACITY_COLUMN}" DESC, {keys} LIMIT {int(n)}')
+        return self._cursor().execute(sql, parameters).df()
+
+
+BACKENDS = {backend.name: backend for backend in (IndexBackend, ArrowBackend, DuckDBBackend)}
+
+
+def create_backend(dataset, name=None, threads=None):
+    """
+    Create the query backend of a dataset
+    Args:
+        dataset: the Dataset, with its indexes built
+        name: 'index', 'arrow' or 'duckdb', read from QUERY_BACKEND when not provided
+        threads: threads of the arrow and duckdb backends, read from QUERY_THREADS when not provided (0: all cores)
+    Returns:
+        the backend
+    """
+    name = name or os.getenv("QUERY_BACKEND") or "index"
+    if name not in BACKENDS:
+        raise ValueError(f"unknown query backend '{name}', choose from {', '.join(BACKENDS)}")
+    if name == "index":
+        return IndexBackend(dataset)
+    if threads is None:
+        threads = int(os.getenv("QUERY_THREADS") or 0)
+    return BACKENDS[name](dataset, threads=threads or None)
@@ -0,0 +1,77 @@
+"""
+this module contains the query state: the filters of an interaction and the rows they select, shared by all views
+"""
+
+from utils.filter_cache import normalize_filters
+from utils.metrics import phase
+
+
+class QueryState:
+    """
+    The normalized filters of one interaction, the dataset they apply to and the row mask they select.
+
+    The mask is computed on first use and then shared by every view of the interaction (map, bar chart), so an
+    interaction costs at most a single filter pass. Views that are answered from a cache or a precomputed index never trigger
+    it. The shared mask is read-only. The dataset is read from the DatasetHandle once, all views of the interaction use
+that version even when a reload swaps in a new one meanwhile.
+    """
+
+    def __init__(self, dataset, continent, sub_region, country, status, itype, time_range, time_mode):
+        """
+        Args:
+            dataset: the Dataset of the interaction
+            other arguments: the raw filter values of the dash components, see FilterIndex.mask
+        """
+        self.dataset = dataset
+        self.filters = normalize_filters(continent, sub_region, country, status, itype, time_range, time_mode)
+        self._mask = None
+
+    @property
+    def version(self):
+        """the data version, part of the cache key of every result computed from the dataset"""
+        return self.dataset.version
+
+    @property
+    def status(self):
+        return self.filters[3]
+
+    @property
+    def itype(self):
+        return self.filters[4]
+
+    @property
+    def time_range(self):
+        return self.filters[5]
+
+    @property
+    def time_mode(self):
+        return self.filters[6]
+
+    def without(self, argument):
+        """
+        Returns:
+            the filters with the provided filter argument ('status', 'itype', ...) cleared, for the options of its own
+            dropdown
+        """
+        names = ["continent", "sub_region", "country", "status", "itype", "time_range", "time_mode"]
+        return tuple(None if name == argument else value for name, value in zip(names, self.filters))
+
+    @property
+    def mask(self):
+        """
+        the numpy boolean row mask of the filters, computed once. When the dataset has a FilterCache, the masks of
+        recent queries are shared with the other requests and sessions
+        """
+        if self._mask is None:
+            with phase("filter"):
+                filter_cache = self.dataset.filter_cache
+                if filter_cache is None:
+                    self._mask = self._compute_mask()
+                else:
+                    self._mask = filter_cache.get_or_compute((self.version, self.filters), self._compute_mask)
+        return self._mask
+
+    def _compute_mask(self):
+        mask = self.dataset.backend.mask(*self.filters)
+        mask.flags.writeable = False
+        return mask
@@ -0,0 +1,107 @@
+"""
+this module contains a uniform grid index over latitude / longitude and helpers to derive the visible map area
+"""
+
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid over the globe, storing the row positions of the projects sorted by grid cell.
+
+    Cells are numbered row by row (latitude bands), so the cells of one band that overlap a bounding box are
+    contiguous and the candidates of a query are a handful of slices of the sorted position array.
+    """
+
+    def __init__(self, lat, lon, cell_size=1.0):
+        """
+        Build the index
+        Args:
+            lat: array of latitudes
+            lon: array of longitudes
+            cell_size: size of a grid cell in degrees
+        """
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_size = cell_size
+        self.n_rows = math.ceil(180 / cell_size)
+        self.n_cols = math.ceil(360 / cell_size)
+
+        cells = self._cell_row(self.lat) * self.n_cols + self._cell_col(self.lon)
+        self.order = np.argsort(cells, kind="stable")
+        # offsets[c] is the first position in order that belongs to cell c
+        counts = np.bincount(cells, minlength=self.n_rows * self.n_cols)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def query(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Find the projects inside a bounding box. When lon_min > lon_max the box crosses the antimeridian.
+        Returns:
+            sorted array of row positions
+        """
+        if lon_min <= lon_max:
+            lon_ranges = [(lon_min, lon_max)]
+        else:
+            lon_ranges = [(lon_min, 180.0), (-180.0, lon_max)]
+
+        candidates = []
+        for row in range(self._cell_row(lat_min), self._cell_row(lat_max) + 1):
+            for west, east in lon_ranges:
+                first_cell = row * self.n_cols + self._cell_col(west)
+                last_cell = row * self.n_cols + self._cell_col(east)
+                candidates.append(self.order[self.offsets[first_cell]:self.offsets[last_cell + 1]])
+        positions = np.concatenate(candidates) if candidates else np.empty(0, dtype=int)
+
+        # exact check, the border cells are only partially covered by the box
+        lat, lon = self.lat[positions], self.lon[positions]
+        inside = (lat >= lat_min) & (lat <= lat_max)
+        inside &= np.logical_or.reduce([(lon >= west) & (lon <= east) for west, east in lon_ranges])
+        return np.sort(positions[inside])
+
+    def _cell_row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_size), 0, self.n_rows - 1).astype(int)
+
+    def _cell_col(self, lon):
+        return np.clip(np.floor((np.asarray(lon) + 180) / self.cell_size), 0, self.n_cols - 1).astype(int)
+
+
+def viewport_bounds(zoom_info, center, zoom, margin=0.5, viewport_px=(1600, 1000)):
+    """
+    Determine the (lat_min, lat_max, lon_min, lon_max) box of the visible map area, extended with a margin
+    Args:
+        zoom_info: relayoutData of the map, the corner coordinates in 'mapbox._derived' are used when present
+        center: dict with lat and lon of the map center, used to estimate the box otherwise
+        zoom: mapbox zoom level, used to estimate the box otherwise
+        margin: fraction of the width / height added on every side
+        viewport_px: (width, height) in pixels assumed for the estimate, taken on the large side
+
+    Returns:
+        a tuple of 4 floats, or None when the visible area is unknown or covers the whole world
+    """
+    derived = (zoom_info or {}).get("mapbox._derived")
+    if derived and derived.get("coordinates"):
+        lons = [c[0] for c in derived["coordinates"]]
+        lats = [c[1] for c in derived["coordinates"]]
+        lon_min, lon_max, lat_min, lat_max = min(lons), max(lons), min(lats), max(lats)
+    elif center is not None:
+        # web mercator: 512 px tiles span 360 degrees of longitude at zoom 0
+        degrees_per_px = 360 / (512 * 2 ** zoom)
+        half_width = viewport_px[0] / 2 * degrees_per_px
+        half_height = viewport_px[1] / 2 * degrees_per_px * math.cos(math.radians(center["lat"]))
+        lon_min, lon_max = center["lon"] - half_width, center["lon"] + half_width
+        lat_min, lat_max = center["lat"] - half_height, center["lat"] + half_height
+    else:
+        return None
+
+    width, height = lon_max - lon_min, lat_max - lat_min
+    lon_min, lon_max = lon_min - margin * width, lon_max + margin * width
+    lat_min, lat_max = max(lat_min - margin * height, -90.0), min(lat_max + margin * height, 90.0)
+    if lon_max - lon_min >= 360:
+        return None
+
+    # wrap the longitudes into [-180, 180], the box may now cross the antimeridian
+    lon_min = (lon_min + 180) % 360 - 180
+    lon_max = (lon_max + 180) % 360 - 180
+    return lat_min, lat_max, lon_min, lon_max
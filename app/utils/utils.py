@@ -2,22 +2,37 @@
 this module contains utilities functions for the app
 """
 
+import numpy as np
+import pandas as pd
 
-def filter_data(df, continent, sub_region, country, status, itype, time_range):
+
+def filter_data(df, continent, sub_region, country, status, itype, time_range, time_mode="start"):
     """
     Filter the provided dataframe based on the values of the provided filters
+    Callbacks should use the prebuilt FilterIndex (utils.filter_index) instead, this function is kept for ad hoc use
+    and as the pandas reference of the query backends (benchmarks/check_backends.py)
     Args:
         df:
         continent: string
-        sub_region: string
-        country: string
-        status: string
-        itype: string
+        sub_region: string or list of strings
+        country: string or list of strings
+        status: string or list of strings
+        itype: string or list of strings
         time_range: tuple (int, int)
+        time_mode: "start" to filter on the start year, "active" to select the rows operating during time_range
 
     Returns:
         a filtered df
     """
+    return df[filter_mask(df, continent, sub_region, country, status, itype, time_range, time_mode)]
+
+
+def filter_mask(df, continent, sub_region, country, status, itype, time_range, time_mode="start"):
+    """
+    Same as filter_data, but returns the boolean row mask
+    Returns:
+        a numpy boolean array with one entry per row of df
+    """
     # # keep this output for debug purposes
     # print(continent)
     # print(sub_region)
@@ -26,33 +41,48 @@ def filter_data(df, continent, sub_region, country, status, itype, time_range):
     # print(itype)
     # print(time_range)
 
-    # Filter DataFrame based on status and time range
-    filtered_df = df.copy()
+    # build a single boolean mask and slice once, no intermediate copies
+    mask = np.ones(len(df), dtype=bool)
 
     # Filter by active continent
     if continent != "Total":
-        filtered_df = filtered_df[filtered_df["Region"] == continent]
-
-    # Filter by sub region
-    if sub_region is not None and sub_region != "":
-        filtered_df = filtered_df[filtered_df["Subregion"] == sub_region]
-
-    # Filter by country
-    if country is not None and country != "":
-        filtered_df = filtered_df[filtered_df["Country"] == country]
+        mask &= member_mask(df["Region"], continent)
 
-    # Filter by status
-    if status is not None and status != "":
-        filtered_df = filtered_df[filtered_df["Status"] == status]
-
-    # Filter by type
-    if itype is not None and itype != "":
-        filtered_df = filtered_df[filtered_df["Installation Type"] == itype]
+    # Filter by sub region, country, status and type
+    for column, value in [("Subregion", sub_region),
+                          ("Country", country),
+                          ("Status", status),
+                          ("Installation Type", itype)]:
+        if value is not None and len(value):
+            mask &= member_mask(df[column], value)
 
     # Filter by time range
-    if time_range is not None:
+    if time_range is not None and time_mode == "active":
+        # operating during the range: started by its end and not retired by its start, no retired year never ends
+        start_year, end_year = time_range
+        mask &= ((df["Start year"] <= end_year) & ~(df["Retired year"] <= start_year)).to_numpy()
+    elif time_range is not None:
         start_year, end_year = time_range
-        filtered_df = filtered_df[(filtered_df["Start year"] >= start_year) & (filtered_df["Start year"] <= end_year)]
+        mask &= ((df["Start year"] >= start_year) & (df["Start year"] <= end_year)).to_numpy()
 
-    return filtered_df
+    return mask
 
+
+def member_mask(series, value):
+    """
+    Test which values of a column are the provided value or one of the provided values, on the integer category codes
+    of a categorical column (a lookup table indexed with the codes) instead of string comparisons
+    Args:
+        series: a column, preferably categorical
+        value: a string or a list of strings
+    Returns:
+        a numpy boolean array
+    """
+    values = [value] if isinstance(value, str) else list(value)
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(values).to_numpy()
+    # the last entry of the lookup table is hit by code -1 (missing values) and is never selected
+    selected = np.zeros(len(series.cat.categories) + 1, dtype=bool)
+    selected[series.cat.categories.get_indexer(values)] = True
+    selected[-1] = False
+    return selected[series.cat.codes.to_numpy()]
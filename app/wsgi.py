@@ -0,0 +1,20 @@
+"""
+WSGI entry point for production servers
+
+The dataset is loaded once by the factory. With gunicorn's preload (see gunicorn.conf.py) this happens in the master
+process, before the workers are forked, so all workers share the frames and indexes copy-on-write.
+
+Run from the app directory:
+    gunicorn -c gunicorn.conf.py "wsgi:create_server()"
+"""
+
+from app import create_app
+
+
+def create_server():
+    """
+    Factory for the WSGI application
+    Returns:
+        the flask server of the dash app
+    """
+    return create_app().server
@@ -0,0 +1,221 @@
+"""
+this module contains the headless callback benchmark
+
+The app is built with create_app() and the interaction traces in benchmarks/traces are replayed through the flask test
+client, posting the same /_dash-update-component requests as the browser. Every server callback fired by a trace step
+is timed, its peak memory is traced and its response size is recorded.
+
+Usage (from the repository root):
+    python benchmarks/bench_callbacks.py                 # run and compare with benchmarks/baseline.json
+    python benchmarks/bench_callbacks.py --save          # run and store the results as the new baseline
+    python benchmarks/bench_callbacks.py --check         # exit with an error code when a metric regressed
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+TRACE_DIR = BENCHMARK_DIR / "traces"
+BASELINE = BENCHMARK_DIR / "baseline.json"
+
+# the app imports are rooted at the app folder
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "app"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app import create_app  # noqa: E402
+from utils.callback_requests import callback_request, initial_state, triggered_callbacks  # noqa: E402
+from utils.dataset import load_dataset  # noqa: E402
+
+# metric -> True when higher is worse, used in the comparison with the baseline
+METRICS = {"p50_ms": True, "p95_ms": True, "p99_ms": True, "peak_kib": True, "bytes": True, "sent_bytes": True}
+
+
+def load_traces(trace_dir=TRACE_DIR):
+    """
+    Returns:
+        dict of trace name -> list of steps, a step is a dict of 'id.property' -> new value
+    """
+    return {path.stem: json.loads(path.read_text())["steps"] for path in sorted(Path(trace_dir).glob("*.json"))}
+
+
+def replay(app, client, steps, on_call):
+    """
+    Replay a trace: apply every step to the page state and post the callbacks it triggers
+    Args:
+        app: the dash app
+        client: a flask test client of app.server
+        steps: list of steps
+        on_call: function(name, post) called for every fired callback, post() sends the request and returns the
+            response
+    """
+    state = initial_state(app)
+    for step in steps:
+        state.update(step)
+        for name, key in triggered_callbacks(app, step).items():
+            inputs = {f'{i["id"]}.{i["property"]}' for i in app.callback_map[key]["inputs"]}
+            body = callback_request(app, key, state, [prop_id for prop_id in step if prop_id in inputs])
+
+            def post():
+                return client.post("/_dash-update-component", json=body, headers={"Accept-Encoding": "gzip"})
+
+            response = on_call(name, post)
+            if response.status_code == 200:
+                # feed the outputs back into the page state, like the renderer does
+                for component_id, props in json.loads(_body(response))["response"].items():
+                    state.update({f"{component_id}.{prop}": value for prop, value in props.items()})
+
+
+def run(traces, repeat=5, cold=True):
+    """
+    Run the benchmark
+    Args:
+        traces: dict of trace name -> steps
+        repeat: number of timed replays of every trace
+        cold: clear the caches of the dataset before every replay
+    Returns:
+        dict with the summary per callback and per trace
+    """
+    dataset = load_dataset()
+    app = create_app(dataset)
+    client = app.server.test_client()
+
+    latencies, sizes, sent, peaks, errors = (defaultdict(list) for _ in range(5))
+    trace_ms = defaultdict(list)
+
+    def timed(name, post):
+        start = time.perf_counter()
+        response = post()
+        latencies[name].append((time.perf_counter() - start) * 1000)
+        sizes[name].append(len(_body(response)))
+        sent[name].append(len(response.data))
+        errors[name].append(response.status_code != 200)
+        return response
+
+    def traced(name, post):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        response = post()
+        peaks[name].append((tracemalloc.get_traced_memory()[1] - current) / 1024)
+        return response
+
+    for trace, steps in traces.items():
+        # one untimed replay to import and compile everything on the first call
+        replay(app, client, steps, lambda name, post: post())
+        for _ in range(repeat):
+            if cold and dataset.filter_cache is not None:
+                dataset.filter_cache.clear()
+            start = time.perf_counter()
+            replay(app, client, steps, timed)
+            trace_ms[trace].append((time.perf_counter() - start) * 1000)
+
+        # memory is traced in a separate replay, tracing slows down the allocations
+        if cold and dataset.filter_cache is not None:
+            dataset.filter_cache.clear()
+        tracemalloc.start()
+        replay(app, client, steps, traced)
+        tracemalloc.stop()
+
+    callbacks = {}
+    for name in sorted(latencies):
+        p50, p95, p99 = np.percentile(latencies[name], [50, 95, 99])
+        callbacks[name] = {
+            "calls": len(latencies[name]),
+            "errors": int(sum(errors[name])),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "peak_kib": round(float(max(peaks[name])), 1),
+            "bytes": int(np.median(sizes[name])),
+            "sent_bytes": int(np.median(sent[name])),
+        }
+    return {
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "repeat": repeat,
+                        "cold": cold},
+        "callbacks": callbacks,
+        "traces": {trace: {"p50_ms": round(float(np.median(ms)), 1)} for trace, ms in trace_ms.items()},
+    }
+
+
+def compare(results, baseline, tolerance=0.25, min_delta_ms=1.0):
+    """
+    Print the results next to the baseline
+    Args:
+        results: output of run()
+        baseline: output of an earlier run() or None
+        tolerance: relative increase above which a metric is reported as a regression
+        min_delta_ms: latency increases below this absolute value are considered noise
+    Returns:
+        list of (callback, metric) that regressed
+    """
+    regressions = []
+    header = f"{'callback':<55}" + "".join(f"{metric:>22}" for metric in METRICS)
+    print(header)
+    print("-" * len(header))
+    for name, metrics in results["callbacks"].items():
+        old = (baseline or {}).get("callbacks", {}).get(name, {})
+        cells = []
+        for metric, higher_is_worse in METRICS.items():
+            cell = f"{metrics[metric]:g}"
+            if metric in old and old[metric]:
+                change = (metrics[metric] - old[metric]) / old[metric]
+                cell += f" ({change:+.0%})"
+                noise = metric.endswith("_ms") and metrics[metric] - old[metric] < min_delta_ms
+                if higher_is_worse and change > tolerance and not noise:
+                    regressions.append((name, metric))
+                    cell += " !"
+            cells.append(f"{cell:>22}")
+        errors = f"  {metrics['errors']} errors" if metrics["errors"] else ""
+        print(f"{name:<55}" + "".join(cells) + errors)
+
+    print()
+    for trace, metrics in results["traces"].items():
+        old = (baseline or {}).get("traces", {}).get(trace, {}).get("p50_ms")
+        change = f" ({(metrics['p50_ms'] - old) / old:+.0%})" if old else ""
+        print(f"trace {trace:<30} {metrics['p50_ms']:>10g} ms{change}")
+    return regressions
+
+
+def _body(response):
+    """the decompressed body of a response"""
+    if response.headers.get("Content-Encoding") == "gzip":
+        return gzip.decompress(response.data)
+    return response.data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay interaction traces against the dash callbacks")
+    parser.add_argument("--traces", default=TRACE_DIR, help="folder with the trace json files")
+    parser.add_argument("--repeat", type=int, default=5, help="timed replays per trace")
+    parser.add_argument("--warm", action="store_true", help="keep the caches between replays")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline json to compare with")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with code 1 when a metric regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative regression tolerance")
+    args = parser.parse_args()
+
+    results = run(load_traces(args.traces), repeat=args.repeat, cold=not args.warm)
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    regressions = compare(results, baseline, tolerance=args.tolerance)
+
+    if args.save:
+        baseline_path.write_text(json.dumps(results, indent=4) + "\n")
+        print(f"\nbaseline saved to {baseline_path}")
+    if regressions:
+        print(f"\n{len(regressions)} regressions: " + ", ".join(f"{name} {metric}" for name, metric in regressions))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
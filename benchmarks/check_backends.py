@@ -0,0 +1,153 @@
+"""
+this module contains the parity check and timing of the query backends
+
+Random filter combinations (single and multi-select values, both time modes) are run through every available backend
+of app/utils/query_backend.py and compared with the pandas reference: the row masks of utils.filter_data and the top
+projects of a groupby on the project keys with nlargest, like the bar chart before the backends. The masks must be
+identical and the top projects must have the same keys and capacities, in the same order. The median latency per
+backend (and of the pandas reference) is reported.
+
+Usage (from the repository root):
+    python benchmarks/check_backends.py                  # all backends that can be imported
+    python benchmarks/check_backends.py --queries 1000   # more random filter combinations
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+# the app imports are rooted at the app folder
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "app"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from utils.dataset import load_dataset  # noqa: E402
+from utils.filter_cache import normalize_filters  # noqa: E402
+from utils.project_table import ProjectTable  # noqa: E402
+from utils.query_backend import BACKENDS, create_backend  # noqa: E402
+from utils.query_state import QueryState  # noqa: E402
+from utils.utils import filter_mask  # noqa: E402
+
+REFERENCE = "pandas"
+
+
+def random_filters(df, rng):
+    """
+    Returns:
+        the raw arguments of a QueryState (continent, sub_region, country, status, itype, time_range, time_mode), every
+        filter is left empty, set to one value or to a few values
+    """
+    def pick(column, rows=None):
+        values = (df if rows is None else df[rows])[column].dropna().unique()
+        choice = rng.integers(3)
+        if choice == 0 or not len(values):
+            return None
+        if choice == 1:
+            return str(rng.choice(values))
+        return [str(value) for value in rng.choice(values, size=min(len(values), rng.integers(2, 5)), replace=False)]
+
+    continent = "Total" if rng.random() < 0.4 else str(rng.choice(df["Region"].unique()))
+    rows = None if continent == "Total" else (df["Region"] == continent).to_numpy()
+    sub_region = pick("Subregion", rows)
+    country = pick("Country", rows)
+    first_year = int(rng.integers(1980, 2030))
+    time_range = [first_year, first_year + int(rng.integers(0, 25))] if rng.random() < 0.8 else None
+    time_mode = str(rng.choice(["start", "active"]))
+    return continent, sub_region, country, pick("Status"), pick("Installation Type"), time_range, time_mode
+
+
+def reference_top(df, mask, n=20):
+    """
+    Returns:
+        the n largest projects among the rows in mask with pandas: the phases summed per project and nlargest
+    """
+    projects = df[mask].groupby(ProjectTable.KEYS, observed=True).agg({"Capacity (MW)": "sum"}).reset_index()
+    top = projects.nlargest(n, "Capacity (MW)")
+    # nlargest does not order equal capacities, the backends order them like the (sorted) project groups
+    return top.sort_index().sort_values("Capacity (MW)", ascending=False, kind="stable")
+
+
+def check(dataset, backends, queries, seed=0):
+    """
+    Compare the backends with the pandas reference on random queries
+    Args:
+        dataset: the Dataset
+        backends: dict of name -> backend
+        queries: number of random filter combinations
+        seed: seed of the random filters
+    Returns:
+        (mismatches, timings): list of (backend, operation, filters) that differ from the pandas reference, dict of
+        backend (and 'pandas') -> dict of operation -> list of seconds
+    """
+    rng = np.random.default_rng(seed)
+    mismatches = []
+    timings = {name: {"mask": [], "top": []} for name in [REFERENCE] + list(backends)}
+    for _ in range(queries):
+        arguments = random_filters(dataset.df, rng)
+        filters = normalize_filters(*arguments)
+
+        start = time.perf_counter()
+        expected_mask = filter_mask(dataset.df, *filters)
+        timings[REFERENCE]["mask"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        expected_top = reference_top(dataset.df, expected_mask, 20)
+        timings[REFERENCE]["top"].append(time.perf_counter() - start)
+
+        results = {}
+        for name, backend in backends.items():
+            dataset.backend = backend
+            query = QueryState(dataset, *arguments)
+
+            start = time.perf_counter()
+            mask = query.mask
+            timings[name]["mask"].append(time.perf_counter() - start)
+            # the top projects of the mask based backends reuse the mask of the query
+            start = time.perf_counter()
+            top = backend.top(query, 20)
+            timings[name]["top"].append(time.perf_counter() - start)
+            results[name] = (mask, top)
+
+        for name, (mask, top) in results.items():
+            if not np.array_equal(mask, expected_mask):
+                mismatches.append((name, "mask", filters))
+            names, expected_names = (frame["Project Name"].astype(str).tolist() for frame in (top, expected_top))
+            if names != expected_names or not np.allclose(top["Capacity (MW)"], expected_top["Capacity (MW)"]):
+                mismatches.append((name, "top", filters))
+    return mismatches, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the query backends return the same results")
+    parser.add_argument("--queries", type=int, default=300, help="number of random filter combinations")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random filters")
+    args = parser.parse_args()
+
+    dataset = load_dataset()
+    # every backend computes its own masks, a cached mask would hide a difference
+    dataset.filter_cache = None
+    backends = {}
+    for name in BACKENDS:
+        try:
+            backends[name] = create_backend(dataset, name)
+        except ImportError as error:
+            print(f"{name:<8} skipped: {error}")
+
+    mismatches, timings = check(dataset, backends, args.queries, args.seed)
+    print(f"{'backend':<8} {'mask p50_ms':>12} {'top p50_ms':>12}")
+    for name, timing in timings.items():
+        print(f"{name:<8} {np.median(timing['mask']) * 1000:>12.3f} {np.median(timing['top']) * 1000:>12.3f}")
+    for name, operation, filters in mismatches[:10]:
+        print(f"MISMATCH {name} {operation}: {filters}")
+    if mismatches:
+        print(f"{len(mismatches)} mismatches in {args.queries} queries")
+        sys.exit(1)
+    print(f"all backends agree with {REFERENCE} on {args.queries} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+this module contains the check and timing of the interval index over the operating periods
+
+The overlap masks and the capacity-over-time event sweep of app/utils/interval_index.py are compared with a brute
+force evaluation on the dataset: the rows active during random year ranges (with random row selections) and the active
+capacity of every year, summed year by year. The median latency of both approaches is reported.
+
+Usage (from the repository root):
+    python benchmarks/check_interval_index.py                  # 300 random ranges and row selections
+    python benchmarks/check_interval_index.py --queries 1000   # more random ranges
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+# the app imports are rooted at the app folder
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "app"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from utils.dataset import load_dataset  # noqa: E402
+
+
+def brute_force_mask(index, first_year, last_year):
+    """the rows with start <= last_year and end > first_year, missing years compare as false (never ends)"""
+    return (index.start <= last_year) & ~(index.end <= first_year)
+
+
+def brute_force_capacity(index, capacity, mask, first_year, last_year):
+    """the active capacity of every year, one scan over the rows per year"""
+    years = np.arange(first_year, last_year + 1)
+    return years, np.array([capacity[mask & brute_force_mask(index, year, year)].sum() for year in years])
+
+
+def check(dataset, queries, seed=0):
+    """
+    Compare the interval index with the brute force evaluation on random year ranges and row selections
+    Args:
+        dataset: the Dataset
+        queries: number of random ranges
+        seed: seed of the random ranges
+    Returns:
+        (mismatches, timings): list of (operation, first_year, last_year), dict of approach -> list of seconds
+    """
+    rng = np.random.default_rng(seed)
+    index = dataset.active_index
+    capacity = dataset.df["Capacity (MW)"].to_numpy(dtype=float)
+    mismatches = []
+    timings = {"mask": [], "mask brute force": [], "sweep": [], "sweep brute force": []}
+    for _ in range(queries):
+        first_year = int(rng.integers(1980, 2040))
+        last_year = first_year + int(rng.integers(0, 30))
+        # a random subset of the rows, like the filter mask of a query
+        mask = rng.random(index.n_rows) < rng.random()
+
+        start = time.perf_counter()
+        active = index.mask(first_year, last_year)
+        timings["mask"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        expected_active = brute_force_mask(index, first_year, last_year)
+        timings["mask brute force"].append(time.perf_counter() - start)
+        if not np.array_equal(active, expected_active):
+            mismatches.append(("mask", first_year, last_year))
+
+        start = time.perf_counter()
+        years, series = index.capacity_over_time(capacity, mask, first_year, last_year)
+        timings["sweep"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        expected_years, expected_series = brute_force_capacity(index, capacity, mask, first_year, last_year)
+        timings["sweep brute force"].append(time.perf_counter() - start)
+        if not np.array_equal(years, expected_years) or not np.allclose(series, expected_series):
+            mismatches.append(("capacity_over_time", first_year, last_year))
+    return mismatches, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the interval index against a brute force evaluation")
+    parser.add_argument("--queries", type=int, default=300, help="number of random year ranges")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random ranges")
+    args = parser.parse_args()
+
+    mismatches, timings = check(load_dataset(), args.queries, args.seed)
+    print(f"{'operation':<20} {'p50_ms':>10}")
+    for name, timing in timings.items():
+        print(f"{name:<20} {np.median(timing) * 1000:>10.3f}")
+    for operation, first_year, last_year in mismatches[:10]:
+        print(f"MISMATCH {operation}: {first_year}-{last_year}")
+    if mismatches:
+        print(f"{len(mismatches)} mismatches in {args.queries} queries")
+        sys.exit(1)
+    print(f"the interval index agrees with the brute force evaluation on {args.queries} queries")
+
+
+if __name__ == "__main__":
+    main()
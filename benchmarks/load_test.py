@@ -0,0 +1,316 @@
+"""
+this module contains the http load test of the dash callbacks
+
+Every simulated session is a thread with its own http connection and page state: it loads the page (all server
+callbacks fire once) and replays the interaction traces of benchmarks/traces in random order, posting the same
+/_dash-update-component requests as the browser and feeding the responses back into its state. The server is the real
+flask app, served on localhost in this process, by gunicorn for every combination of worker and thread counts, or any
+running instance. Per callback the throughput, latency percentiles and error rate are reported.
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --sessions 1,8,32                              # in-process threaded server
+    python benchmarks/load_test.py --gunicorn --workers 1,2,4 --threads 1,4      # gunicorn, every combination
+    python benchmarks/load_test.py --url http://localhost:12345 --sessions 16    # an instance that is running
+
+Background callbacks (progressive map detail) are polled by the browser and are not part of the load. The sessions
+share one interpreter: in-process they also share it with the server, and a load generator on the same machine takes
+cores from gunicorn. For capacity numbers that hold in production run it with --url from another machine.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import requests
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCHMARK_DIR.parent / "app"
+TRACE_DIR = BENCHMARK_DIR / "traces"
+
+# the app imports are rooted at the app folder
+sys.path.insert(0, str(APP_DIR))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app import create_app  # noqa: E402
+from bench_callbacks import load_traces  # noqa: E402
+from utils.callback_requests import (  # noqa: E402
+    callback_request, initial_state, server_callbacks, triggered_callbacks)
+from utils.dataset import load_dataset  # noqa: E402
+
+UPDATE_PATH = "/_dash-update-component"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url, process=None, timeout=120):
+    """poll the page until the server answers, fails when the server process exits first"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"the server exited with code {process.returncode}")
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not answer within {timeout} s")
+
+
+@contextmanager
+def in_process_server(app):
+    """
+    Serve the app with the threaded werkzeug server (one thread per request) in a background thread
+    Returns:
+        the base url
+    """
+    from werkzeug.serving import make_server
+
+    # werkzeug logs every request
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", _free_port(), app.server, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+@contextmanager
+def gunicorn_server(workers, threads):
+    """
+    Start gunicorn with the production configuration (app/gunicorn.conf.py) and the provided worker and thread counts
+    Returns:
+        the base url
+    """
+    port = _free_port()
+    env = dict(os.environ, WEB_WORKERS=str(workers), WEB_THREADS=str(threads), SERVER_PORT=str(port))
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:create_server()"]
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=log, stderr=log)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            _wait_until_ready(url, process)
+            yield url
+        except RuntimeError:
+            log.seek(0)
+            sys.stderr.write(log.read().decode(errors="replace"))
+            raise
+        finally:
+            process.terminate()
+            process.wait()
+
+
+class Session:
+    """A simulated analyst: one page load followed by trace replays until the run ends"""
+
+    def __init__(self, app, callbacks, page_state, traces, think_seconds, seed):
+        """
+        Args:
+            app: the dash app the requests are built for
+            callbacks: dict of callback name -> callback_map key, the server callbacks under load
+            page_state: the state of the page after loading it, see initial_state
+            traces: dict of trace name -> steps
+            think_seconds: pause between two steps, like a user looking at the result
+            seed: seed of the trace order
+        """
+        self.app = app
+        self.callbacks = callbacks
+        self.page_state = page_state
+        self.traces = traces
+        self.think_seconds = think_seconds
+        self.random = random.Random(seed)
+
+    def run(self, url, stop_at, record):
+        """
+        Post the requests of the session until stop_at (time.perf_counter)
+        Args:
+            url: base url of the server
+            stop_at: end of the run
+            record: function(name, start, seconds, ok) called for every request
+        """
+        http = requests.Session()
+        while time.perf_counter() < stop_at:
+            state = dict(self.page_state)
+            # the page load fires every callback without a trigger
+            for name, key in self.callbacks.items():
+                self._post(http, url, name, key, state, [], record)
+
+            steps = self.traces[self.random.choice(sorted(self.traces))]
+            for step in steps:
+                if time.perf_counter() >= stop_at:
+                    return
+                time.sleep(self.think_seconds)
+                state.update(step)
+                for name, key in triggered_callbacks(self.app, step).items():
+                    if name not in self.callbacks:
+                        continue
+                    inputs = {f'{i["id"]}.{i["property"]}' for i in self.app.callback_map[key]["inputs"]}
+                    self._post(http, url, name, key, state, [prop_id for prop_id in step if prop_id in inputs],
+                               record)
+
+    def _post(self, http, url, name, key, state, changed, record):
+        """post a callback request and feed its outputs back into the page state, like the renderer does"""
+        body = callback_request(self.app, key, state, changed)
+        start = time.perf_counter()
+        try:
+            response = http.post(url + UPDATE_PATH, json=body, timeout=60)
+            ok = response.status_code in (200, 204)
+        except requests.RequestException:
+            response, ok = None, False
+        record(name, start, time.perf_counter() - start, ok)
+
+        if response is not None and response.status_code == 200:
+            for component_id, props in response.json()["response"].items():
+                state.update({f"{component_id}.{prop}": value for prop, value in props.items()})
+
+
+def load(url, app, traces, sessions, duration, warmup=5.0, think_seconds=0.0):
+    """
+    Run the sessions against a server
+    Args:
+        url: base url of the server
+        app: the dash app the requests are built for
+        traces: dict of trace name -> steps
+        sessions: number of concurrent sessions
+        duration: seconds measured
+        warmup: seconds before the measurement starts, the requests sent meanwhile are not recorded
+        think_seconds: pause between two steps of a session
+    Returns:
+        dict of callback name -> summary, with the 'total' over all callbacks
+    """
+    callbacks = {name: key for name, key in server_callbacks(app).items() if not app.callback_map[key].get("long")}
+    page_state = initial_state(app)
+    start = time.perf_counter()
+    record_from, stop_at = start + warmup, start + warmup + duration
+    samples = []
+
+    def record(name, request_start, seconds, ok):
+        if record_from <= request_start < stop_at:
+            # list.append is atomic, the sessions share the list
+            samples.append((name, seconds, ok))
+
+    threads = [threading.Thread(target=Session(app, callbacks, page_state, traces, think_seconds, seed).run,
+                                args=(url, stop_at, record), daemon=True)
+               for seed in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, duration)
+
+
+def summarize(samples, duration):
+    """
+    Args:
+        samples: list of (callback name, seconds, ok)
+        duration: seconds measured
+    Returns:
+        dict of callback name -> requests, throughput, latency percentiles and error rate, with the 'total'
+    """
+    groups = {}
+    for name, seconds, ok in samples:
+        groups.setdefault(name, []).append((seconds, ok))
+    groups = dict(sorted(groups.items()))
+    groups["total"] = [(seconds, ok) for _, seconds, ok in samples]
+
+    summary = {}
+    for name, group in groups.items():
+        if not group:
+            continue
+        latencies = np.array([seconds for seconds, _ in group]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary[name] = {
+            "requests": len(group),
+            "rps": round(len(group) / duration, 1),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "error_rate": round(sum(not ok for _, ok in group) / len(group), 4),
+        }
+    return summary
+
+
+def report(configuration, summary):
+    """print the summary of a run"""
+    print(f"\n{configuration}")
+    header = f"{'callback':<40}" + "".join(f"{column:>12}" for column in ("requests", "rps", "p50_ms", "p95_ms",
+                                                                          "p99_ms", "errors"))
+    print(header)
+    print("-" * len(header))
+    for name, metrics in summary.items():
+        print(f"{name:<40}{metrics['requests']:>12}{metrics['rps']:>12g}{metrics['p50_ms']:>12g}"
+              f"{metrics['p95_ms']:>12g}{metrics['p99_ms']:>12g}{metrics['error_rate']:>12.2%}")
+
+
+@contextmanager
+def _existing(url):
+    """a server that is already running"""
+    _wait_until_ready(url)
+    yield url.rstrip("/")
+
+
+def _counts(text):
+    return [int(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dash callbacks with concurrent sessions over http")
+    parser.add_argument("--sessions", type=_counts, default=[1, 8, 32], help="comma separated concurrent sessions")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds at the start of a run")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause of a session between two steps")
+    parser.add_argument("--traces", default=TRACE_DIR, help="folder with the trace json files")
+    parser.add_argument("--url", help="base url of a running server, instead of starting one")
+    parser.add_argument("--gunicorn", action="store_true", help="start gunicorn for every worker and thread count")
+    parser.add_argument("--workers", type=_counts, default=[1, 2, 4], help="comma separated gunicorn worker counts")
+    parser.add_argument("--threads", type=_counts, default=[1, 4], help="comma separated gunicorn thread counts")
+    parser.add_argument("--json", help="store the results in this json file")
+    args = parser.parse_args()
+
+    traces = load_traces(args.traces)
+    # the requests are built from the callbacks and layout of a local app
+    app = create_app(load_dataset())
+
+    servers = []
+    if args.url:
+        servers.append((f"server {args.url}", lambda: _existing(args.url)))
+    elif args.gunicorn:
+        for workers in args.workers:
+            for threads in args.threads:
+                servers.append((f"gunicorn workers={workers} threads={threads}",
+                                lambda workers=workers, threads=threads: gunicorn_server(workers, threads)))
+    else:
+        servers.append(("in-process threaded server", lambda: in_process_server(app)))
+
+    results = []
+    for server, start_server in servers:
+        with start_server() as url:
+            for sessions in args.sessions:
+                summary = load(url, app, traces, sessions, args.duration, args.warmup, args.think_ms / 1000)
+                report(f"{server} sessions={sessions}", summary)
+                results.append({"server": server, "sessions": sessions, "callbacks": summary})
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
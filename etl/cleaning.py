@@ -0,0 +1,145 @@
+"""
+this module contains the cleaning rules that turn the raw GWPT units into the clean dataset of the dashboard
+
+The rules follow the analyses in data/analysis (status simplification, outliers, missing start and retired years).
+"""
+
+import numpy as np
+
+# columns of the clean dataset, in order
+GWPT_COLUMNS = ["Country", "Project Name", "Phase Name", "Capacity (MW)", "Installation Type", "Status", "Start year",
+                "Retired year", "Operator", "Operator Name in Local Language / Script", "Owner", "Latitude", "Longitude",
+                "Location accuracy", "City", "Local area (taluk, county)", "Major area (prefecture, district)",
+                "State/Province", "Subregion", "Region", "Wiki URL"]
+NUMERIC_COLUMNS = ["Capacity (MW)", "Start year", "Retired year", "Latitude", "Longitude"]
+GEO_KEYS = ["Region", "Subregion", "Country"]
+AGG_KEYS = GEO_KEYS + ["Status", "Installation Type"]
+
+# raw status -> simplified status, cancelled and shelved units have no added value for the analysis and are dropped
+STATUS_MAPPING = {
+    "operating": "operating",
+    "retired": "retired",
+    "mothballed": "retired",
+    "announced": "future",
+    "pre-construction": "future",
+    "construction": "future",
+}
+
+# announced mega projects (10 GW and more) distort the capacity views, see analysis_outliers.xlsx
+MAX_CAPACITY_MW = 10000
+
+# generic words removed from the project names, case insensitive (e.g. 'Kabertene wind farm' -> 'Kabertene')
+PROJECT_NAME_WORDS = r"wind farm|wind project|wind park|wind energy center|wind turbines|wind turbine|wind complex|" \
+                     r"wind plant|windpower farm|wind power facility"
+
+# year imputation, see year_missing_data_approach.pptx
+LIFE_SPAN = 15
+CURRENT_YEAR = 2023
+FIRST_FUTURE_YEAR = 2025
+# status -> (start year, retired year) when both years are missing
+DEFAULT_YEARS = {
+    "retired": (2008, 2023),
+    "operating": (2017, 2031),  # half way their life in 2024
+    "future": (2025, 2040),
+}
+
+
+def simplify_status(df):
+    """
+    Map the raw statuses on operating / future / retired and drop the units without a mapping
+    Args:
+        df: a df with the raw units
+    Returns:
+        the remaining units with the simplified status
+    """
+    status = df["Status"].map(STATUS_MAPPING)
+    return df[status.notna()].assign(Status=status[status.notna()])
+
+
+def remove_outliers(df):
+    """
+    Returns:
+        the units below MAX_CAPACITY_MW
+    """
+    return df[df["Capacity (MW)"] < MAX_CAPACITY_MW]
+
+
+def normalize_installation_type(df):
+    """
+    Merge all offshore variants (hard mount, floating, mount unknown) into 'offshore', all other units are 'onshore'
+    """
+    offshore = df["Installation Type"].fillna("").str.lower().str.startswith("offshore")
+    return df.assign(**{"Installation Type": np.where(offshore, "offshore", "onshore")})
+
+
+def clean_project_names(df):
+    """
+    Strip the generic words (wind farm, wind park, ...) from the project names, the phases of a project keep their
+    'Phase Name'
+    """
+    names = df["Project Name"].str.replace(PROJECT_NAME_WORDS, "", regex=True, case=False).str.strip()
+    return df.assign(**{"Project Name": names})
+
+
+def impute_years(df):
+    """
+    Fill the missing start and retired years:
+        - only the retired year is missing: start year + life span, at most the current year for retired units and at
+          least the first future year for operating units
+        - only the start year is missing: retired year - life span
+        - both are missing: a default per status
+    Args:
+        df: a df with the simplified status
+    Returns:
+        the df with integer start and retired years
+    """
+    start = df["Start year"]
+    retired = df["Retired year"]
+    status = df["Status"]
+
+    expected = start + LIFE_SPAN
+    expected = expected.where(status != "retired", np.minimum(expected, CURRENT_YEAR))
+    expected = expected.where(status != "operating", np.maximum(expected, FIRST_FUTURE_YEAR))
+    new_retired = retired.fillna(expected)
+    new_start = start.fillna(retired - LIFE_SPAN)
+
+    both_missing = start.isna() & retired.isna()
+    for unit_status, (default_start, default_retired) in DEFAULT_YEARS.items():
+        selection = both_missing & (status == unit_status)
+        new_start[selection] = default_start
+        new_retired[selection] = default_retired
+
+    return df.assign(**{"Start year": new_start.astype("int64"), "Retired year": new_retired.astype("int64")})
+
+
+def clean_gwpt(raw):
+    """
+    Apply all cleaning rules
+    Args:
+        raw: the raw units of all sheets, indexed by their row in the sheet
+    Returns:
+        the clean dataset with GWPT_COLUMNS
+    """
+    df = simplify_status(raw)
+    df = remove_outliers(df)
+    df = normalize_installation_type(df)
+    df = clean_project_names(df)
+    df = impute_years(df)
+    return df[GWPT_COLUMNS]
+
+
+def aggregate_countries(gwpt):
+    """
+    Returns:
+        the capacity and mean location per country, status and installation type (gwpt_agg)
+    """
+    aggregation = {"Capacity (MW)": "sum", "Latitude": "mean", "Longitude": "mean"}
+    return gwpt.groupby(AGG_KEYS).agg(aggregation).reset_index()
+
+
+def geo_table(gwpt):
+    """
+    Returns:
+        the region / subregion / country mapping with the mean location of every country (geo)
+    """
+    return gwpt.groupby(GEO_KEYS).agg({"Latitude": "mean", "Longitude": "mean"}).reset_index()
@@ -0,0 +1,192 @@
+"""
+this module contains the command line ETL from the raw GWPT workbook to the clean parquet files of the dashboard
+
+Stages:
+    extract: stream the sheets of the raw workbook into data/interim/gwpt_raw, partitioned by sheet
+    clean: apply the cleaning rules of cleaning.py and write data/clean/gwpt.parquet
+    aggregate: write the country aggregate (gwpt_agg.parquet) and the region mapping (geo.parquet)
+
+Every stage hashes its input files and the ETL code. A stage whose hash did not change since its last run (and whose
+outputs exist) is skipped, so a new tracker release only rebuilds what depends on it.
+
+Usage (from the repository root):
+    python etl/pipeline.py                                  # run the stages that are out of date
+    python etl/pipeline.py --raw data/raw/<new release>.xlsx
+    python etl/pipeline.py --force                          # rebuild everything
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import cleaning
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[1]
+RAW_WORKBOOK = ROOT / "data" / "raw" / "Global-Wind-Power-Tracker-December-2023.xlsx"
+INTERIM_DIR = ROOT / "data" / "interim"
+CLEAN_DIR = ROOT / "data" / "clean"
+MANIFEST = INTERIM_DIR / "manifest.json"
+
+# the sheets holding units, in the order they are stacked
+SHEETS = ["Data", "Below Threshold"]
+BATCH_ROWS = 5000
+COMPRESSION = "zstd"
+
+
+def file_hash(paths):
+    """
+    Returns:
+        the sha256 of the contents of the provided files, folders are hashed file by file in sorted order
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        path = Path(path)
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            digest.update(file.relative_to(path.parent).as_posix().encode())
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(1024 ** 2), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def extract(workbook, output_dir):
+    """
+    Stream the unit sheets of the workbook into a parquet dataset partitioned by sheet, the workbook is read row by
+    row in read-only mode so memory stays bounded
+    Args:
+        workbook: path of the raw xlsx
+        output_dir: folder of the dataset, one sheet=<name> folder per sheet
+    """
+    book = openpyxl.load_workbook(workbook, read_only=True, data_only=True)
+    try:
+        for sheet in SHEETS:
+            rows = book[sheet].iter_rows(values_only=True)
+            header = [str(name).strip() for name in next(rows)]
+            schema = pa.schema([("row", pa.int64())] + [
+                (name, pa.float64() if name in cleaning.NUMERIC_COLUMNS else pa.string()) for name in header])
+
+            path = Path(output_dir) / f"sheet={sheet}" / "part-0.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            n_rows = 0
+            with pq.ParquetWriter(path, schema, compression=COMPRESSION) as writer:
+                batch = []
+                for values in rows:
+                    if all(value is None for value in values):
+                        continue
+                    batch.append(values)
+                    if len(batch) == BATCH_ROWS:
+                        writer.write_table(_typed_batch(batch, header, n_rows, schema))
+                        n_rows += len(batch)
+                        batch = []
+                if batch:
+                    writer.write_table(_typed_batch(batch, header, n_rows, schema))
+                    n_rows += len(batch)
+            logger.info("extracted %d rows from sheet %s", n_rows, sheet)
+    finally:
+        book.close()
+
+
+def _typed_batch(batch, header, first_row, schema):
+    """convert a list of raw row tuples into an arrow table with the extract schema"""
+    df = pd.DataFrame(batch, columns=header)
+    for name in header:
+        if name in cleaning.NUMERIC_COLUMNS:
+            df[name] = pd.to_numeric(df[name], errors="coerce")
+        else:
+            df[name] = df[name].map(lambda value: None if value is None else str(value))
+    df.insert(0, "row", range(first_row, first_row + len(df)))
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def read_extract(input_dir):
+    """
+    Returns:
+        the raw units of all sheets stacked in SHEETS order, indexed by their row in the sheet
+    """
+    frames = [pd.read_parquet(Path(input_dir) / f"sheet={sheet}").set_index("row") for sheet in SHEETS]
+    raw = pd.concat(frames)
+    raw.index.name = None
+    return raw
+
+
+def clean(input_dir, output_dir):
+    """
+    Clean the extracted units into gwpt.parquet
+    """
+    gwpt = cleaning.clean_gwpt(read_extract(input_dir))
+    gwpt.to_parquet(Path(output_dir) / "gwpt.parquet", compression=COMPRESSION)
+    logger.info("cleaned %d units", len(gwpt))
+
+
+def aggregate(input_dir, output_dir):
+    """
+    Derive gwpt_agg.parquet and geo.parquet from the clean units
+    """
+    gwpt = pd.read_parquet(Path(input_dir) / "gwpt.parquet")
+    cleaning.aggregate_countries(gwpt).to_parquet(Path(output_dir) / "gwpt_agg.parquet", compression=COMPRESSION)
+    cleaning.geo_table(gwpt).to_parquet(Path(output_dir) / "geo.parquet", compression=COMPRESSION)
+
+
+def stages(workbook):
+    """
+    Returns:
+        list of (name, input paths, output paths, function) in execution order
+    """
+    extract_dir = INTERIM_DIR / "gwpt_raw"
+    return [
+        ("extract", [workbook], [extract_dir], lambda: extract(workbook, extract_dir)),
+        ("clean", [extract_dir], [CLEAN_DIR / "gwpt.parquet"], lambda: clean(extract_dir, CLEAN_DIR)),
+        ("aggregate", [CLEAN_DIR / "gwpt.parquet"], [CLEAN_DIR / "gwpt_agg.parquet", CLEAN_DIR / "geo.parquet"],
+         lambda: aggregate(CLEAN_DIR, CLEAN_DIR)),
+    ]
+
+
+def run(workbook=RAW_WORKBOOK, force=False):
+    """
+    Run the stages that are out of date
+    Args:
+        workbook: path of the raw xlsx
+        force: run all stages
+    """
+    INTERIM_DIR.mkdir(parents=True, exist_ok=True)
+    CLEAN_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+    code_hash = file_hash([Path(__file__), Path(cleaning.__file__)])
+
+    for name, inputs, outputs, function in stages(Path(workbook)):
+        # the hash of an input that another stage writes is only known after that stage ran
+        fingerprint = hashlib.sha256((code_hash + file_hash(inputs)).encode()).hexdigest()
+        if not force and manifest.get(name) == fingerprint and all(Path(p).exists() for p in outputs):
+            logger.info("%s: up to date, skipped", name)
+            continue
+
+        start = time.perf_counter()
+        function()
+        manifest[name] = fingerprint
+        MANIFEST.write_text(json.dumps(manifest, indent=4))
+        logger.info("%s: done in %.1f s", name, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the clean parquet files from the raw GWPT workbook")
+    parser.add_argument("--raw", default=RAW_WORKBOOK, help="path of the raw GWPT xlsx")
+    parser.add_argument("--force", action="store_true", help="run all stages, even when their inputs did not change")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    run(args.raw, force=args.force)
+
+
+if __name__ == "__main__":
+    main()